@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+ASSET_BUDGET_BYTES = 32 * 1024 * 1024  # Decoded images kept around once nothing holds them, least recently used goes first
+
+
+def decode_image(path):
+    # Runs on the loader thread, so only decoding happens here; convert_alpha needs the display and the main thread
+    try:
+        return pygame.image.load(path)
+    except FileNotFoundError:
+        return None
+    except (pygame.error, OSError) as error:
+        # A corrupt or unsupported file is treated like a missing one rather than crashing whoever polls next
+        print(f"[AssetManager] Can't decode {path}: {error}")
+        return None
+
+
+class AssetManager:
+    def __init__(self, budget_bytes=ASSET_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.surface_bytes = 0
+        self.surfaces = OrderedDict()  # path -> converted Surface, least recently used first
+        self.refcounts = {}  # path -> holders, only unreferenced surfaces can be evicted
+        self.missing = set()  # Paths we've found don't exist, so nobody checks the disk for them again
+        self.pending = {}  # path -> Future of the decoded Surface
+        self.placeholders = {}  # (color, size) -> Surface
+        self.loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asset-loader")
+
+    def preload(self, paths):
+        # Starts decoding anything not loaded yet on the loader thread
+        for path in paths:
+            if path not in self.surfaces and path not in self.pending and path not in self.missing:
+                self.pending[path] = self.loader.submit(decode_image, path)
+
+    def poll(self):
+        # Moves finished loads into the cache, called from the main thread. Returns how many finished
+        finished = [path for path, future in self.pending.items() if future.done()]
+        for path in finished:
+            self.finish(path)
+        return len(finished)
+
+    def finish(self, path):
+        surface = self.pending.pop(path).result()
+        if surface is None:
+            self.missing.add(path)
+            return
+        self.store(path, surface.convert_alpha())
+
+    def store(self, path, surface):
+        self.surfaces[path] = surface
+        self.surface_bytes += surface.get_width() * surface.get_height() * surface.get_bytesize()
+        self.evict()
+
+    def acquire(self, path):
+        # Blocking: waits for a pending load or loads it now. Returns None for missing files
+        if path in self.pending:
+            self.finish(path)
+        elif path not in self.surfaces and path not in self.missing:
+            self.pending[path] = self.loader.submit(decode_image, path)
+            self.finish(path)
+        return self.hold(path)
+
+    def acquire_loaded(self, path):
+        # Never touches the disk: returns the surface only if it's already decoded, otherwise queues it and returns None
+        self.poll()
+        if path not in self.surfaces:
+            self.preload([path])
+        return self.hold(path)
+
+    def hold(self, path):
+        surface = self.surfaces.get(path)
+        if surface is not None:
+            self.surfaces.move_to_end(path)
+            self.refcounts[path] = self.refcounts.get(path, 0) + 1
+        return surface
+
+    def release(self, path):
+        count = self.refcounts.get(path, 0) - 1
+        if count > 0:
+            self.refcounts[path] = count
+        else:
+            self.refcounts.pop(path, None)
+            self.evict()
+
+    def evict(self):
+        if self.surface_bytes <= self.budget_bytes:
+            return
+        for path in [path for path in self.surfaces if path not in self.refcounts]:
+            surface = self.surfaces.pop(path)
+            self.surface_bytes -= surface.get_width() * surface.get_height() * surface.get_bytesize()
+            if self.surface_bytes <= self.budget_bytes:
+                break
+
+    def placeholder(self, color, size):
+        key = (tuple(color), size)
+        surface = self.placeholders.get(key)
+        if surface is None:
+            surface = pygame.Surface(size)
+            surface.fill(color)
+            self.placeholders[key] = surface
+        return surface
+
+    def build_atlas(self, paths):
+        # Packs images into one surface side by side, returns it with each path's Rect (None for missing files)
+        images = [self.acquire(path) if path else None for path in paths]
+        width = sum(image.get_width() for image in images if image)
+        height = max((image.get_height() for image in images if image), default=0)
+        atlas = pygame.Surface((max(width, 1), max(height, 1)), pygame.SRCALPHA).convert_alpha()
+        rects = []
+        x = 0
+        for path, image in zip(paths, images):
+            if image is None:
+                rects.append(None)
+                continue
+            atlas.blit(image, (x, 0), special_flags=pygame.BLEND_RGBA_ADD)  # Adding onto a clear atlas copies alpha as-is
+            rects.append(pygame.Rect(x, 0, image.get_width(), image.get_height()))
+            x += image.get_width()
+            self.release(path)  # The atlas has its own copy of the pixels
+        return atlas, rects
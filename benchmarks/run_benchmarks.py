@@ -0,0 +1,197 @@
+import os
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from engine import Game
+from benchmarks.synthetic_world import write_world
+
+# name -> (width, height, npc count)
+SCALES = {
+    "tiny": (32, 32, 10),
+    "small": (128, 128, 500),
+    "medium": (512, 512, 5000),
+    "large": (2000, 2000, 20000),
+}
+
+
+def time_call(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.mean(samples),
+        "max_ms": max(samples),
+    }
+
+
+def force_all_npcs_due(game):
+    # NPC moves are timed by the store's timer queues, the game's TimerQueue (the autosave) is left alone
+    store = game.npc_data
+    store.schedule(np.arange(store.count), np.full(store.count, game.clock.now()))
+
+
+def find_wall_cells(tile_map, limit=100):
+    cells = []
+    for y in range(tile_map.height):
+        for x in range(tile_map.width):
+            if not tile_map.is_walkable(x, y):
+                cells.append([x, y])
+                if len(cells) >= limit:
+                    return cells
+    return cells
+
+
+def run_scale(name, width, height, npc_count, repeat, seed):
+    results = {}
+    with tempfile.TemporaryDirectory() as world_dir:
+        maps_path, npcs_path = write_world(world_dir, width, height, npc_count, seed=seed)
+
+        # Render into an offscreen surface the size of the real window
+        screen = pygame.Surface((800, 600))
+        game = Game(screen, seed=seed)
+        load_repeat = max(1, repeat // 5)
+        results["load_maps"] = time_call(lambda: game.load_maps(maps_path), load_repeat)
+        results["load_npcs"] = time_call(lambda: game.load_npcs(npcs_path), load_repeat)
+        game.load_assets(maps_path, npcs_path)
+
+    results["place_npcs"] = time_call(game.place_npcs, load_repeat)
+    results["setup_game"] = time_call(game.setup_game, load_repeat)
+    game.current_state = "exploring"
+
+    wall_cells = find_wall_cells(game.maps["map1"])
+    results["find_nearest_non_wall"] = time_call(
+        lambda: [game.find_nearest_non_wall(cell, "map1") for cell in wall_cells], repeat)
+
+    path_start = tuple(game.find_nearest_non_wall([1, 1], "map1"))
+    path_goal = tuple(game.find_nearest_non_wall([width // 2, height // 2], "map1"))
+    game.navigation.region_labels("map1")  # Built once per map, not part of each query
+    results["find_path"] = time_call(lambda: game.navigation.find_path("map1", path_start, path_goal), repeat)
+
+    results["handle_npc_movement"] = time_call(game.handle_npc_movement, repeat,
+                                               setup=lambda: force_all_npcs_due(game))
+
+    game.player_pos = [width // 2, height // 2]
+    game.update_camera()
+    results["draw_map"] = time_call(game.draw_map, repeat)
+    results["render_exploration"] = time_call(lambda: game.render_exploration(True), repeat)
+
+    # A typical frame: a batch of NPCs stepped, then only the damage around them redrawn
+    def step_npcs():
+        force_all_npcs_due(game)
+        game.handle_npc_movement()
+    results["render_damage"] = time_call(lambda: game.render_exploration(False), repeat, setup=step_npcs)
+
+    conversation = game.conversation_engine
+    npc = next(iter(game.npc_data.values()))
+    conversation.dialogue = npc["dialogue"]
+    conversation.current_node = npc["dialogue"].start_node(npc["seduction_level"])
+    conversation.character_image = conversation.create_placeholder_image(npc["color"])
+    long_text = " ".join(npc["dialogue"].texts)
+    # Cold wrap each time, with the memo and the word widths cleared, a cache hit would only time a dict lookup
+    def clear_text_caches():
+        game.text_renderer.wrapped.clear()
+        game.text_renderer.word_widths.clear()
+    results["wrap_text"] = time_call(lambda: conversation.wrap_text(long_text, conversation.font, 680), repeat,
+                                     setup=clear_text_caches)
+    results["render_conversation"] = time_call(conversation.render_conversation, repeat)
+
+    # Entering a map the player left a minute ago, so its NPCs have to be caught up
+    def leave_for_a_minute():
+        game.change_map("map1", [1, 1])
+        game.clock.advance(60)
+    results["change_map"] = time_call(lambda: game.change_map("map2", [1, 1]), repeat, setup=leave_for_a_minute)
+
+    print(f"[Bench] {name} ({width}x{height}, {npc_count} NPCs)")
+    for bench_name, result in results.items():
+        print(f"[Bench]   {bench_name:<24} median {result['median_ms']:10.3f} ms   min {result['min_ms']:10.3f} ms")
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    # Returns a list of (scale, bench, baseline median, current median) that got slower than the threshold
+    regressions = []
+    for scale, benches in results.items():
+        for bench_name, result in benches.items():
+            previous = baseline.get("results", {}).get(scale, {}).get(bench_name)
+            if not previous:
+                continue
+            ratio = result["median_ms"] / previous["median_ms"] if previous["median_ms"] else 1.0
+            marker = "REGRESSION" if ratio > 1 + threshold else ""
+            print(f"[Bench] {scale}/{bench_name:<24} {previous['median_ms']:10.3f} -> {result['median_ms']:10.3f} ms "
+                  f"({ratio:5.2f}x) {marker}")
+            if marker:
+                regressions.append((scale, bench_name, previous["median_ms"], result["median_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engine hot paths on synthetic worlds")
+    parser.add_argument("--scale", nargs="+", default=["tiny", "small"], choices=sorted(SCALES),
+                        help="Preset world sizes to run")
+    parser.add_argument("--size", nargs=3, type=int, metavar=("WIDTH", "HEIGHT", "NPCS"),
+                        help="Custom world size, run in addition to --scale")
+    parser.add_argument("--repeat", type=int, default=20, help="Samples per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed slowdown against the baseline median before failing (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((800, 600))
+
+    scales = {name: SCALES[name] for name in args.scale}
+    if args.size:
+        scales["custom_{}x{}_{}".format(*args.size)] = tuple(args.size)
+
+    results = {}
+    for name, (width, height, npc_count) in scales.items():
+        results[name] = run_scale(name, width, height, npc_count, args.repeat, args.seed)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"[Bench] Results written to {args.output}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        print(f"[Bench] {len(regressions)} regression(s) over {args.threshold:.0%}")
+
+    pygame.quit()
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import json
+import os
+import random
+
+FIRST_NAMES = ["Homer", "Marge", "Bart", "Lisa", "Moe", "Edna", "Selma", "Apu", "Nelson", "Ralph", "Agnes", "Kirk"]
+LAST_NAMES = ["Simpson", "Szyslak", "Krabappel", "Bouvier", "Muntz", "Wiggum", "Skinner", "Van Houten"]
+MOVEMENT_LEVELS = ["toodling", "restless", "wandering"]
+WORDS = ("donut beer springfield power plant nuclear kwik mart bowling krusty burger "
+         "couch saxophone detention monorail squishee duff flanders itchy scratchy").split()
+
+
+def generate_map(width, height, rng, wall_density=0.15):
+    # Border walls, random wall blocks inside, and a guaranteed open spawn area around (5, 5)
+    rows = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            if x in (0, width - 1) or y in (0, height - 1):
+                row.append("1")
+            elif x <= 8 and y <= 8:
+                row.append("0")
+            else:
+                row.append("1" if rng.random() < wall_density else "0")
+        rows.append(row)
+    return rows
+
+
+def generate_maps(width, height, map_count, rng):
+    maps = {}
+    names = ["map1"] + [f"map{i + 1}" for i in range(1, map_count)]
+    for name in names:
+        maps[name] = generate_map(width, height, rng)
+
+    # Chain the maps together with a door pair between neighbours
+    for i in range(len(names) - 1):
+        here, there = names[i], names[i + 1]
+        maps[here][2][width - 2] = f"D[{there}]"
+        maps[there][2][1] = f"D[{here}]"
+    return maps
+
+
+def random_sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def generate_branch(rng, depth, branching, seduction_change):
+    # A small dialogue tree shaped like the ones in npcs.json
+    nodes = {}
+    counter = [0]
+
+    def build(key, level):
+        node = {"text": random_sentence(rng, rng.randint(12, 40)), "options": []}
+        if level >= depth:
+            node["seduction_change"] = rng.choice(seduction_change)
+        else:
+            for _ in range(branching):
+                counter[0] += 1
+                child = f"node_{counter[0]}"
+                node["options"].append({"response": random_sentence(rng, rng.randint(3, 8)), "next": child})
+                build(child, level + 1)
+        nodes[key] = node
+
+    build("start", 0)
+    return nodes
+
+
+def generate_npcs(npc_count, maps, rng, dialogue_depth=3, branching=2):
+    npcs = {}
+    map_names = list(maps.keys())
+    for i in range(npc_count):
+        map_name = rng.choice(map_names)
+        rows = maps[map_name]
+        seducible = rng.random() < 0.4
+        if seducible:
+            dialogue = {f"seduction_{level}": generate_branch(rng, dialogue_depth, branching, [-1, 0, 1])
+                        for level in range(4)}
+        else:
+            dialogue = {"seduction_-99": generate_branch(rng, dialogue_depth, branching, [0])}
+
+        npcs[f"npc_{i}"] = {
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "map": map_name,
+            "start_pos": [rng.randrange(1, len(rows[0]) - 1), rng.randrange(1, len(rows) - 1)],
+            "bounds": [3, 3],
+            "color": [rng.randrange(256), rng.randrange(256), rng.randrange(256)],
+            "movement_level": rng.choice(MOVEMENT_LEVELS),
+            "seduction_level": 0 if seducible else -99,
+            "dialogue": dialogue,
+        }
+    return npcs
+
+
+def write_world(output_dir, width, height, npc_count, map_count=2, seed=0):
+    # Writes maps.json and npcs.json into output_dir and returns their paths
+    rng = random.Random(seed)
+    maps = generate_maps(width, height, map_count, rng)
+    npcs = generate_npcs(npc_count, maps, rng)
+
+    os.makedirs(output_dir, exist_ok=True)
+    maps_path = os.path.join(output_dir, "maps.json")
+    npcs_path = os.path.join(output_dir, "npcs.json")
+    with open(maps_path, "w") as file:
+        json.dump(maps, file)
+    with open(npcs_path, "w") as file:
+        json.dump(npcs, file)
+    return maps_path, npcs_path
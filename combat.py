@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+
+TURN_LIMIT = 100  # Rounds before a fight is called a draw
+PLAYER_ID = "player"  # Combatant entry the player fights as
+
+
+class CombatData:
+    # Abilities as arrays indexed by ability number, so a round for any number of fights is a few numpy ops
+    def __init__(self, abilities, combatants):
+        self.ability_ids = list(abilities)
+        self.ability_names = [ability.get("name", ability_id) for ability_id, ability in abilities.items()]
+        self.power = np.array([ability.get("power", 0) for ability in abilities.values()], dtype=np.int32)
+        self.heal = np.array([ability.get("heal", 0) for ability in abilities.values()], dtype=np.int32)
+        self.accuracy = np.array([ability.get("accuracy", 1.0) for ability in abilities.values()], dtype=np.float64)
+        self.crit = np.array([ability.get("crit", 0.0) for ability in abilities.values()], dtype=np.float64)
+        ability_index = {ability_id: i for i, ability_id in enumerate(self.ability_ids)}
+        self.combatants = {combatant_id: Combatant(combatant_id, info, ability_index)
+                           for combatant_id, info in combatants.items()}
+
+
+class Combatant:
+    def __init__(self, combatant_id, info, ability_index):
+        self.id = combatant_id
+        self.name = info.get("name", combatant_id)
+        self.hp = info["hp"]
+        self.attack = info.get("attack", 0)
+        self.defense = info.get("defense", 0)
+        self.speed = info.get("speed", 0)
+        # {ability id: weight}, the weights are how often the AI (or a simulated player) picks each one
+        abilities = info["abilities"]
+        unknown = [ability_id for ability_id in abilities if ability_id not in ability_index]
+        if unknown:
+            raise ValueError(f"combatant '{combatant_id}' has unknown abilities {unknown}")
+        self.abilities = np.array([ability_index[ability_id] for ability_id in abilities], dtype=np.int64)
+        weights = np.array(list(abilities.values()), dtype=np.float64)
+        if not len(weights) or not np.all(np.isfinite(weights)) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError(f"combatant '{combatant_id}' needs ability weights that are >= 0 and add up to more than 0")
+        self.cumulative_weights = np.cumsum(weights / weights.sum())
+        self.cumulative_weights[-1] = 1.0
+
+
+def load_combat_data(file_path):
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+    return CombatData(data["abilities"], data["combatants"])
+
+
+def choose_abilities(combatant, count, rng):
+    # Weighted random ability per fight
+    picks = np.searchsorted(combatant.cumulative_weights, rng.random(count), side="right")
+    return combatant.abilities[picks]
+
+
+def apply_ability(data, attacker, defender, ability, attacker_hp, defender_hp, acting, rng):
+    # One action in each fight where acting is set. Returns the new hit points and what happened
+    count = len(ability)
+    hit = acting & (rng.random(count) < data.accuracy[ability])
+    crit = hit & (rng.random(count) < data.crit[ability])
+    power = data.power[ability]
+    damage = np.where(hit & (power > 0), np.maximum(1, power + attacker.attack - defender.defense), 0)
+    damage = np.where(crit, damage * 2, damage)
+    healed = np.where(acting, np.minimum(data.heal[ability], attacker.hp - attacker_hp), 0)
+    return attacker_hp + healed, defender_hp - damage, damage, healed, hit, crit
+
+
+def resolve_round(data, player, enemy, player_hp, enemy_hp, player_ability, enemy_ability, rng):
+    # Both sides act once, the faster first (the player on a tie). Someone knocked out before their turn doesn't act.
+    # Returns the new hit points and, per action in order, (side, ability, acting, damage, healed, hit, crit)
+    fighters = (player, enemy)
+    hp = [player_hp, enemy_hp]
+    abilities = (player_ability, enemy_ability)
+    actions = []
+    for side in ((0, 1) if player.speed >= enemy.speed else (1, 0)):
+        other = 1 - side
+        acting = (hp[0] > 0) & (hp[1] > 0)
+        hp[side], hp[other], damage, healed, hit, crit = apply_ability(
+            data, fighters[side], fighters[other], abilities[side], hp[side], hp[other], acting, rng)
+        actions.append((side, abilities[side], acting, damage, healed, hit, crit))
+    return hp[0], hp[1], actions
+
+
+def simulate(data, player, enemy, fights, rng, turn_limit=TURN_LIMIT):
+    # Runs every fight at once, one round per pass over the ones still going. Both sides pick by their weights.
+    # Returns (player won, enemy won, rounds taken, player hit points left) per fight
+    player_hp = np.full(fights, player.hp, dtype=np.int32)
+    enemy_hp = np.full(fights, enemy.hp, dtype=np.int32)
+    rounds = np.full(fights, turn_limit, dtype=np.int32)
+    live = np.arange(fights)
+    for turn in range(1, turn_limit + 1):
+        new_player_hp, new_enemy_hp, _ = resolve_round(
+            data, player, enemy, player_hp[live], enemy_hp[live],
+            choose_abilities(player, live.size, rng), choose_abilities(enemy, live.size, rng), rng)
+        player_hp[live] = new_player_hp
+        enemy_hp[live] = new_enemy_hp
+        finished = (new_player_hp <= 0) | (new_enemy_hp <= 0)
+        rounds[live[finished]] = turn
+        live = live[~finished]
+        if not live.size:
+            break
+    return enemy_hp <= 0, player_hp <= 0, rounds, np.maximum(player_hp, 0)
@@ -1,36 +1,126 @@
+import numpy as np
 import pygame
 
+from combat import PLAYER_ID, TURN_LIMIT, choose_abilities, resolve_round
+
+LOG_LINES = 6  # Most recent turn results shown under the fighters
+HP_BAR_WIDTH = 300
+
 class CombatEngine:
-    def __init__(self, screen):
+    def __init__(self, screen, scheduler, text_renderer):
         self.screen = screen
+        self.scheduler = scheduler
+        self.text_renderer = text_renderer
+        self.font = text_renderer.get_font(36)
+        self.small_font = text_renderer.get_font(28)
         self.active = False  # Track whether combat is ongoing
+        self.data = None
+        self.player = None
+        self.opponent = None
+        self.rng = None
+        self.log = []
+        self.result = None  # "won", "lost" or "draw" once the fight is over, waiting for a key to leave
+        self.on_end = None  # Called with the result when the player leaves the combat screen
 
-    def start_combat(self, player, opponent):
+    def start_combat(self, data, opponent_id, rng, on_end):
+        # Turns are taken from handle_event, there's no loop of its own
+        self.data = data
+        self.player = data.combatants[PLAYER_ID]
+        self.opponent = data.combatants[opponent_id]
+        self.player_hp = self.player.hp
+        self.opponent_hp = self.opponent.hp
+        self.turn = 0
+        self.rng = rng
+        self.on_end = on_end
+        self.result = None
+        self.log = [f"{self.opponent.name} wants to fight!"]
         self.active = True
-        self.player = player
-        self.opponent = opponent
-        self.combat_loop()
-
-    def combat_loop(self):
-        # Main combat logic
-        while self.active:
-            self.render()
-            self.handle_combat_turn()
-
-    def handle_combat_turn(self):
-        # Handle player and opponent turns
-        pass
+        print(f"[CombatEngine] Starting combat with {self.opponent.name}")
+        self.scheduler.mark_dirty()
+
+    def handle_event(self, event):
+        if event.type != pygame.KEYDOWN or not self.active:
+            return
+        if self.result is not None:
+            self.end_combat()
+            return
+        if pygame.K_1 <= event.key < pygame.K_1 + len(self.player.abilities):
+            self.take_turn(event.key - pygame.K_1)
+
+    def take_turn(self, choice):
+        # One round through the same resolver the balance simulator uses, as a batch of one fight
+        player_ability = self.player.abilities[choice:choice + 1]
+        opponent_ability = choose_abilities(self.opponent, 1, self.rng)
+        player_hp, opponent_hp, actions = resolve_round(
+            self.data, self.player, self.opponent, np.array([self.player_hp]), np.array([self.opponent_hp]),
+            player_ability, opponent_ability, self.rng)
+        self.player_hp = max(0, int(player_hp[0]))
+        self.opponent_hp = max(0, int(opponent_hp[0]))
+        self.turn += 1
+        for side, ability, acting, damage, healed, hit, crit in actions:
+            if acting[0]:
+                self.log.append(self.describe_action(side, int(ability[0]), int(damage[0]), int(healed[0]), hit[0], crit[0]))
+
+        if self.opponent_hp <= 0:
+            self.result = "won"
+            self.log.append(f"{self.opponent.name} is down. You win!")
+        elif self.player_hp <= 0:
+            self.result = "lost"
+            self.log.append(f"You got beaten up by {self.opponent.name}.")
+        elif self.turn >= TURN_LIMIT:
+            self.result = "draw"
+            self.log.append("You both give up. It's a draw.")
+        self.log = self.log[-LOG_LINES:]
+        self.scheduler.mark_dirty()
+
+    def describe_action(self, side, ability, damage, healed, hit, crit):
+        name = "You" if side == 0 else self.opponent.name
+        ability_name = self.data.ability_names[ability]
+        parts = []
+        if self.data.power[ability] > 0:
+            if not hit:
+                parts.append("missed")
+            else:
+                parts.append(f"{'critical hit, ' if crit else ''}{damage} damage")
+        if self.data.heal[ability] > 0:
+            parts.append(f"+{healed} HP")
+        return f"{name}: {ability_name} ({', '.join(parts)})"
 
     def update(self):
-        # Update combat state
+        # Combat only moves on key presses
         pass
 
     def render(self):
-        # Render combat screen
+        # The whole combat screen, redrawn when a turn changes it
         self.screen.fill((0, 0, 0))
-        # Draw combat elements (e.g., health bars, actions)
+        if self.active:
+            self.draw_fighter(self.opponent.name, self.opponent_hp, self.opponent.hp, (40, 30))
+            self.draw_fighter("You", self.player_hp, self.player.hp, (400, 150))
+
+            for i, line in enumerate(self.log):
+                surface = self.text_renderer.render(line, self.small_font, (255, 255, 255))
+                self.screen.blit(surface, (40, 240 + i * 28))
+
+            if self.result is None:
+                for i, ability in enumerate(self.player.abilities):
+                    option = f"{i + 1}. {self.data.ability_names[ability]}"
+                    surface = self.text_renderer.render(option, self.font, (200, 200, 200))
+                    self.screen.blit(surface, (40 + (i % 2) * 360, 430 + (i // 2) * 40))
+            else:
+                surface = self.text_renderer.render("Press any key to continue", self.font, (200, 200, 200))
+                self.screen.blit(surface, (40, 430))
         pygame.display.flip()
 
+    def draw_fighter(self, name, hp, max_hp, pos):
+        x, y = pos
+        self.screen.blit(self.text_renderer.render(name, self.font, (255, 255, 255)), (x, y))
+        pygame.draw.rect(self.screen, (80, 0, 0), (x, y + 40, HP_BAR_WIDTH, 20))
+        pygame.draw.rect(self.screen, (0, 200, 0), (x, y + 40, HP_BAR_WIDTH * hp // max_hp, 20))
+        hp_text = self.text_renderer.render(f"{hp}/{max_hp}", self.small_font, (255, 255, 255))
+        self.screen.blit(hp_text, (x + HP_BAR_WIDTH + 10, y + 40))
+
     def end_combat(self):
+        print(f"[CombatEngine] Combat with {self.opponent.name} over: {self.result}")
         self.active = False
-        # Logic to return to the main game loop
+        if self.on_end:
+            self.on_end(self.result)
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from combat import PLAYER_ID, TURN_LIMIT, load_combat_data, simulate
+
+CHUNK_FIGHTS = 250000  # Fights simulated per task, big enough for numpy to pay off and small enough to spread out
+
+
+def simulate_chunk(task):
+    # Runs one chunk of one matchup. Returns totals plus a histogram of fight lengths, so chunks add together exactly
+    combat_path, player_id, enemy_id, fights, seed = task
+    data = load_combat_data(combat_path)
+    rng = np.random.default_rng(seed)
+    won, lost, rounds, hp_left = simulate(data, data.combatants[player_id], data.combatants[enemy_id], fights, rng)
+    return {
+        "enemy": enemy_id,
+        "fights": fights,
+        "wins": int(won.sum()),
+        "losses": int(lost.sum()),
+        "rounds": np.bincount(rounds, minlength=TURN_LIMIT + 1),
+        "hp_left_on_wins": int(hp_left[won].sum()),
+    }
+
+
+def histogram_percentile(histogram, point):
+    cumulative = np.cumsum(histogram)
+    return int(np.searchsorted(cumulative, cumulative[-1] * point / 100))
+
+
+def run_matchups(combat_path, enemies, fights, player_id=PLAYER_ID, seed=None, jobs=None):
+    # Every matchup split into chunks with independent seeds, spread over a process pool
+    if fights < 1:
+        raise ValueError("need at least one fight per matchup")
+    seeds = np.random.SeedSequence(seed)
+    tasks = []
+    for enemy_id in enemies:
+        chunks = [CHUNK_FIGHTS] * (fights // CHUNK_FIGHTS) + ([fights % CHUNK_FIGHTS] if fights % CHUNK_FIGHTS else [])
+        for chunk_fights, chunk_seed in zip(chunks, seeds.spawn(len(chunks))):
+            tasks.append((combat_path, player_id, enemy_id, chunk_fights, chunk_seed))
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) < 2:
+        chunk_results = [simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            chunk_results = list(pool.map(simulate_chunk, tasks))
+
+    totals = {}
+    for chunk in chunk_results:
+        total = totals.get(chunk["enemy"])
+        if total is None:
+            totals[chunk["enemy"]] = chunk
+        else:
+            for key in ("fights", "wins", "losses", "rounds", "hp_left_on_wins"):
+                total[key] = total[key] + chunk[key]
+
+    results = []
+    for enemy_id in enemies:
+        total = totals[enemy_id]
+        fights = total["fights"]
+        rounds = total["rounds"]
+        results.append({
+            "player": player_id,
+            "enemy": enemy_id,
+            "fights": fights,
+            "win_rate": total["wins"] / fights,
+            "loss_rate": total["losses"] / fights,
+            "draw_rate": (fights - total["wins"] - total["losses"]) / fights,
+            "mean_rounds": float(np.dot(np.arange(len(rounds)), rounds) / fights),
+            "median_rounds": histogram_percentile(rounds, 50),
+            "p95_rounds": histogram_percentile(rounds, 95),
+            "mean_hp_left_on_wins": total["hp_left_on_wins"] / total["wins"] if total["wins"] else 0.0,
+        })
+    return results
+
+
+def format_report(result):
+    return (f"[CombatSim] {result['player']} vs {result['enemy']}: win {result['win_rate']:.1%}, "
+            f"loss {result['loss_rate']:.1%}, draw {result['draw_rate']:.2%}, "
+            f"rounds mean {result['mean_rounds']:.1f} median {result['median_rounds']} p95 {result['p95_rounds']}, "
+            f"{result['mean_hp_left_on_wins']:.1f} HP left after a win")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo combat balance: simulate many fights per matchup")
+    parser.add_argument("--combat", default="data/combat.json", help="Combat data file")
+    parser.add_argument("--fights", type=int, default=1000000, help="Fights per matchup")
+    parser.add_argument("--enemy", action="append", help="Enemy to fight, repeatable (default: every combatant)")
+    parser.add_argument("--player", default=PLAYER_ID, help="Combatant the player fights as")
+    parser.add_argument("--seed", type=int, default=None, help="Seed, for repeatable numbers")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per CPU, 1 runs inline)")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.fights < 1:
+        parser.error("--fights must be at least 1")
+    try:
+        data = load_combat_data(args.combat)
+    except ValueError as error:
+        parser.error(f"{args.combat}: {error}")
+    enemies = args.enemy or [combatant_id for combatant_id in data.combatants if combatant_id != args.player]
+    for combatant_id in [args.player] + enemies:
+        if combatant_id not in data.combatants:
+            parser.error(f"no combatant '{combatant_id}' in {args.combat}")
+
+    start = time.perf_counter()
+    results = run_matchups(args.combat, enemies, args.fights, args.player, args.seed, args.jobs)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        print(format_report(result))
+    total_fights = sum(result["fights"] for result in results)
+    print(f"[CombatSim] {total_fights} fights in {elapsed:.2f}s ({total_fights / elapsed / 1e6:.2f}M fights/s)")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump(results, file, indent=2)
@@ -1,41 +1,50 @@
 import pygame
-from npcs import NPCManager
+from dialogue import NO_NODE
+
+PANEL_RECT = pygame.Rect(0, 380, 800, 220)  # Strip the dialogue sits in, cleared behind the box
+DIALOGUE_BOX = pygame.Rect(40, 380, 700, 180)
+PORTRAIT_POS = (600, 180)
+
+def portrait_path(npc_name):
+    return f'assets/characters/{npc_name.lower().replace(" ", "_")}.png'
 
 class ConversationEngine:
     def __init__(self, screen, game_instance):
         self.screen = screen
         self.game_instance = game_instance
-        self.npc_manager = NPCManager()
-        self.current_dialogue = None
+        self.npc_manager = game_instance.npc_manager
+        self.dialogue = None  # CompiledDialogue of the NPC being talked to
+        self.current_node = None  # Index into self.dialogue's node tables
         self.npc = None
         self.character_image = None
-        self.font = pygame.font.Font(None, 36)
+        self.portrait_path = None  # Held in the asset manager while it's on screen
+        self.holding_portrait = False
+        self.assets = game_instance.assets
+        self.text_renderer = game_instance.text_renderer
+        self.font = self.text_renderer.get_font(36)
         self.conversation_active = False  # Track if a conversation is active
+        self.changed = False  # The UI needs redrawing even where nothing moved behind it, cleared by the game
         self.on_end = None  # Callback for when the conversation ends
+        self.combat_requested = False  # The conversation ended on a node that starts a fight
 
     def start_conversation(self, npc, on_end_callback):
         print(f"[ConversationEngine] Starting conversation with NPC: {npc['name']}")
         self.npc = npc
+        self.combat_requested = False
 
         # Retrieve the current seduction level from the NPCManager
         seduction_level = self.npc_manager.get_seduction_level(npc["id"])
         npc["seduction_level"] = seduction_level
-        
-        # Construct the correct dialogue key
-        if seduction_level == -99:
-            dialogue_key = "seduction_-99"
-        else:
-            dialogue_key = f"seduction_{seduction_level}"
-        
-        # Attempt to get the start dialogue under the correct key
-        self.current_dialogue = npc["dialogue"].get(dialogue_key, {}).get("start", None)
+        self.dialogue = npc["dialogue"]
 
-        if self.current_dialogue is None:
+        # Start node of the branch for this seduction level, or the top-level tree without one
+        if self.dialogue.start_node(seduction_level) == NO_NODE:
             print(f"[ConversationEngine] No valid dialogue found for {npc['name']} with seduction level {seduction_level}. Falling back to start dialogue.")
-            self.current_dialogue = npc["dialogue"].get("start", None)
+        self.current_node = self.dialogue.entry_node(seduction_level)
 
         # If still no valid dialogue, end the conversation
-        if self.current_dialogue is None:
+        if self.current_node == NO_NODE:
+            self.current_node = None
             print(f"[ConversationEngine] No valid start dialogue found for {npc['name']}. Ending conversation.")
             self.conversation_active = False
             if on_end_callback:
@@ -45,109 +54,108 @@ class ConversationEngine:
         self.conversation_active = True
         self.on_end = on_end_callback
 
-        # Attempt to load the character image
-        try:
-            self.character_image = pygame.image.load(f'assets/characters/{npc["name"].lower().replace(" ", "_")}.png').convert_alpha()
-        except FileNotFoundError:
-            # Create a large colored square as a placeholder using the NPC's color from the npcs.json file
-            self.character_image = self.create_placeholder_image(npc["color"])
+        # Use the character image if it's been preloaded, this never waits on the disk
+        self.portrait_path = portrait_path(npc["name"])
+        self.character_image = self.create_placeholder_image(npc["color"])
+        self.refresh_portrait()
 
-        self.handle_conversation()
+        # From here the conversation is driven by handle_event and render_conversation from the main loop
+        self.changed = True
+        self.game_instance.scheduler.mark_dirty()
+        print(f"[ConversationEngine] Current Dialogue: {self.dialogue.texts[self.current_node]}")
+
+    def refresh_portrait(self):
+        # Swaps the placeholder for the real image once the asset manager has it
+        image = self.assets.acquire_loaded(self.portrait_path)
+        if image is not None:
+            self.character_image = image
+            self.holding_portrait = True
+            self.changed = True
 
     def create_placeholder_image(self, color):
-        placeholder = pygame.Surface((200, 400))
-        placeholder.fill(color)
-        return placeholder
-
-    def handle_conversation(self):
-        print("[ConversationEngine] Handling conversation...")
-        while self.conversation_active and self.current_dialogue:
-            print(f"[ConversationEngine] Current Dialogue: {self.current_dialogue['text'] if self.current_dialogue else 'None'}")
-            self.render_conversation()
-            self.wait_for_player_input()
-        print("[ConversationEngine] Exiting conversation loop.")
+        # A large colored square using the NPC's color from the npcs.json file, shared between conversations
+        return self.assets.placeholder(color, (200, 400))
 
     def render_conversation(self):
-        if self.current_dialogue is None:
-            return  # Avoid rendering if there's no valid dialogue
-
-        self.screen.fill((0, 0, 0), (0, 380, 800, 220))
-        self.screen.blit(self.character_image, (600, 180))
-
-        pygame.draw.rect(self.screen, (0, 0, 0), pygame.Rect(40, 380, 700, 180))
-        pygame.draw.rect(self.screen, (255, 255, 255), pygame.Rect(40, 380, 700, 180), 2)
-
-        wrapped_text = self.wrap_text(self.current_dialogue["text"], self.font, 680)
-        for i, line in enumerate(wrapped_text):
-            text_surface = self.font.render(line, True, (255, 255, 255))
-            self.screen.blit(text_surface, (50, 400 + i * 30))
-
-        for i, option in enumerate(self.current_dialogue["options"]):
-            option_text = f"{i + 1}. {option['response']}"
-            option_surface = self.font.render(option_text, True, (200, 200, 200))
-            self.screen.blit(option_surface, (50, 450 + (len(wrapped_text) + i) * 30))
-
-        leave_text = f"{len(self.current_dialogue['options']) + 1}. Smell you later"
-        leave_surface = self.font.render(leave_text, True, (200, 200, 200))
-        self.screen.blit(leave_surface, (50, 450 + (len(wrapped_text) + len(self.current_dialogue['options'])) * 30))
-
-        pygame.display.flip()
-
-    def wait_for_player_input(self):
-        print("[ConversationEngine] Waiting for player input...")
-        waiting_for_input = True
-        total_options = len(self.current_dialogue["options"]) + 1  # Including "Smell you later"
-        while waiting_for_input and self.conversation_active:
-            for event in pygame.event.get():
-                if event.type == pygame.KEYDOWN:
-                    print(f"[ConversationEngine] Key pressed: {pygame.key.name(event.key)}")
-                    if pygame.K_1 <= event.key <= pygame.K_1 + total_options - 1:
-                        option_index = event.key - pygame.K_1
-                        if option_index < len(self.current_dialogue["options"]):
-                            print(f"[ConversationEngine] Player selected option {option_index + 1}: {self.current_dialogue['options'][option_index]['response']}")
-                            self.pending_seduction_change = self.current_dialogue["options"][option_index].get("seduction_change", None)
-                            print(f"[ConversationEngine] Pending seduction change: {self.pending_seduction_change}")
-                            self.select_dialogue_option(option_index)
-                            waiting_for_input = False
-                        elif option_index == len(self.current_dialogue["options"]):
-                            print(f"[ConversationEngine] Player selected 'Smell you later' option.")
-                            self.end_conversation()
-                            waiting_for_input = False
-                        else:
-                            print(f"[ConversationEngine] Option {option_index + 1} is out of range.")
-                    else:
-                        print(f"[ConversationEngine] Key press not recognized for any option.")
+        # Draws the whole dialogue UI, the caller presents it
+        for _, _, draw, args in self.overlays():
+            draw(*args)
+
+    def overlays(self):
+        # (key, screen rect, draw function, args) for each piece of the UI, in drawing order
+        if self.current_node is None:
+            return []  # Avoid rendering if there's no valid dialogue
+        if self.portrait_path and not self.holding_portrait:
+            self.refresh_portrait()
+        portrait_rect = self.character_image.get_rect(topleft=PORTRAIT_POS)
+        return [("panel", PANEL_RECT, self.screen.fill, ((0, 0, 0), PANEL_RECT)),
+                ("portrait", portrait_rect, self.screen.blit, (self.character_image, PORTRAIT_POS)),
+                ("dialogue", PANEL_RECT, self.draw_dialogue, ())]
+
+    def draw_dialogue(self):
+        options = self.dialogue.options[self.current_node]
+        pygame.draw.rect(self.screen, (0, 0, 0), DIALOGUE_BOX)
+        pygame.draw.rect(self.screen, (255, 255, 255), DIALOGUE_BOX, 2)
+
+        profiler = self.game_instance.profiler
+        with profiler.span("dialogue_text"):
+            wrapped_text = self.wrap_text(self.dialogue.texts[self.current_node], self.font, 680)
+            for i, line in enumerate(wrapped_text):
+                text_surface = self.text_renderer.render(line, self.font, (255, 255, 255))
+                self.screen.blit(text_surface, (50, 400 + i * 30))
+
+            for i, (response, _) in enumerate(options):
+                option_text = f"{i + 1}. {response}"
+                option_surface = self.text_renderer.render(option_text, self.font, (200, 200, 200))
+                self.screen.blit(option_surface, (50, 450 + (len(wrapped_text) + i) * 30))
+
+            leave_text = f"{len(options) + 1}. Smell you later"
+            leave_surface = self.text_renderer.render(leave_text, self.font, (200, 200, 200))
+            self.screen.blit(leave_surface, (50, 450 + (len(wrapped_text) + len(options)) * 30))
+        if profiler.enabled:
+            text_count = len(wrapped_text) + len(options) + 1
+            profiler.count("text", text_count)
+            profiler.count("blits", text_count + 1)  # Plus the portrait
+
+    def handle_event(self, event):
+        if event.type != pygame.KEYDOWN or not self.conversation_active or self.current_node is None:
+            return
 
-    def select_dialogue_option(self, option_index):
-        next_dialogue_key = self.current_dialogue["options"][option_index]["next"]
-        print(f"[ConversationEngine] Selected dialogue option {option_index + 1}, moving to: {next_dialogue_key}")
-        
-        # Determine the current seduction level and branch
-        seduction_level = self.npc_manager.get_seduction_level(self.npc["id"])
-        if seduction_level == -99:
-            seduction_key = "seduction_-99"
+        options = self.dialogue.options[self.current_node]
+        total_options = len(options) + 1  # Including "Smell you later"
+        print(f"[ConversationEngine] Key pressed: {pygame.key.name(event.key)}")
+        if pygame.K_1 <= event.key <= pygame.K_1 + total_options - 1:
+            option_index = event.key - pygame.K_1
+            if option_index < len(options):
+                print(f"[ConversationEngine] Player selected option {option_index + 1}: {options[option_index][0]}")
+                self.select_dialogue_option(option_index)
+            elif option_index == len(options):
+                print(f"[ConversationEngine] Player selected 'Smell you later' option.")
+                self.end_conversation()
         else:
-            seduction_key = f"seduction_{seduction_level}"
-        
-        # Access the dialogue branch
-        dialogue_branch = self.npc["dialogue"].get(seduction_key, None)
-        
-        if dialogue_branch:
-            self.current_dialogue = dialogue_branch.get(next_dialogue_key, None)
-        else:
-            self.current_dialogue = None
+            print(f"[ConversationEngine] Key press not recognized for any option.")
+
+    def select_dialogue_option(self, option_index):
+        next_node = self.dialogue.options[self.current_node][option_index][1]
+        print(f"[ConversationEngine] Selected dialogue option {option_index + 1}, moving to node: {next_node}")
 
-        # If this is the final dialogue with no options, apply seduction change if any
-        if self.current_dialogue is None or not self.current_dialogue.get("options"):
-            self.apply_seduction_change()  # Apply any pending seduction change
+        # Option targets are resolved when the dialogue is compiled
+        self.current_node = next_node if next_node != NO_NODE else None
+        self.changed = True
+        self.game_instance.scheduler.mark_dirty()
+
+        # If this is the final dialogue with no options, end the conversation (which applies any seduction change)
+        if self.current_node is None or not self.dialogue.options[self.current_node]:
             print(f"[ConversationEngine] Ending conversation with final dialogue.")
             self.end_conversation()
         else:
-            print(f"[ConversationEngine] Continuing conversation with dialogue: {self.current_dialogue['text']}")
+            print(f"[ConversationEngine] Continuing conversation with dialogue: {self.dialogue.texts[self.current_node]}")
 
     def apply_seduction_change(self):
         # Apply seduction change if defined in the current dialogue
-        seduction_change = self.current_dialogue.get("seduction_change", None)
+        if self.current_node is None:
+            return
+        seduction_change = self.dialogue.seduction_changes[self.current_node]
         if seduction_change is not None:
             self.npc_manager.update_seduction_level(self.npc["id"], seduction_change)
             print(f"[ConversationEngine] Seduction level for {self.npc['name']} updated to {self.npc_manager.get_seduction_level(self.npc['id'])} in NPCManager list")
@@ -156,24 +164,15 @@ class ConversationEngine:
         # Apply any final seduction change if conversation ends with a seduction-changing dialogue
         self.apply_seduction_change()
         print("[ConversationEngine] Ending conversation.")
-        self.current_dialogue = None
+        self.combat_requested = self.current_node is not None and self.dialogue.starts_combat[self.current_node]
+        self.current_node = None
+        if self.holding_portrait:
+            self.assets.release(self.portrait_path)
+            self.holding_portrait = False
         self.conversation_active = False
         if self.on_end and self.on_end != self.end_conversation:
             self.on_end()
 
     def wrap_text(self, text, font, max_width):
-        words = text.split(' ')
-        lines = []
-        current_line = []
-
-        for word in words:
-            test_line = current_line + [word]
-            width, _ = font.size(' '.join(test_line))
-            if width <= max_width:
-                current_line = test_line
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-
-        lines.append(' '.join(current_line))
-        return lines
+        # Memoized in the shared text renderer
+        return self.text_renderer.wrap(text, font, max_width)
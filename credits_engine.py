@@ -1,11 +1,13 @@
 import pygame
 
 class CreditsEngine:
-    def __init__(self, screen):
+    def __init__(self, screen, scheduler):
         self.screen = screen
+        self.scheduler = scheduler
 
     def start_credits(self):
         # Initialize credits roll
+        self.scheduler.mark_dirty()
         self.credits_loop()
 
     def credits_loop(self):
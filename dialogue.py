@@ -0,0 +1,133 @@
+import hashlib
+import os
+import pickle
+
+DIALOGUE_CACHE_VERSION = 2
+NO_NODE = -1  # Option target / start node that doesn't exist
+
+class CompiledDialogue:
+    # One NPC's dialogue as flat, integer-indexed node tables
+    __slots__ = ("texts", "options", "seduction_changes", "starts_combat", "branch_starts")
+
+    def __init__(self, texts, options, seduction_changes, starts_combat, branch_starts):
+        self.texts = texts  # node -> text
+        self.options = options  # node -> tuple of (response, next node)
+        self.seduction_changes = seduction_changes  # node -> seduction change or None
+        self.starts_combat = starts_combat  # node -> whether ending the conversation here starts a fight
+        self.branch_starts = branch_starts  # seduction level (None for the top-level tree) -> start node
+
+    def start_node(self, seduction_level):
+        return self.branch_starts.get(seduction_level, NO_NODE)
+
+    def entry_node(self, seduction_level):
+        # Where a conversation at this level opens: its seduction branch, else the top-level tree
+        node = self.start_node(seduction_level)
+        return node if node != NO_NODE else self.start_node(None)
+
+    def node_count(self):
+        return len(self.texts)
+
+
+def split_branches(dialogue):
+    # Returns [(seduction level, {node key: node})], plus any branch keys that couldn't be parsed
+    branches = []
+    bad_keys = []
+    top_level = {}
+    for key, value in dialogue.items():
+        if key.startswith("seduction_"):
+            try:
+                branches.append((int(key[len("seduction_"):]), value))
+            except ValueError:
+                bad_keys.append(key)
+        elif isinstance(value, dict) and "text" in value:
+            top_level[key] = value
+    if top_level:
+        branches.append((None, top_level))
+    return branches, bad_keys
+
+
+def compile_dialogue(npc_id, dialogue, problems):
+    texts = []
+    options = []
+    seduction_changes = []
+    starts_combat = []
+    branch_starts = {}
+
+    branches, bad_keys = split_branches(dialogue)
+    for key in bad_keys:
+        problems.append(f"{npc_id}: branch '{key}' isn't seduction_<number>")
+
+    for level, branch in branches:
+        branch_name = "top level" if level is None else f"seduction_{level}"
+        first_node = len(texts)
+        node_index = {key: first_node + i for i, key in enumerate(branch)}
+
+        for key, node in branch.items():
+            if "text" not in node:
+                problems.append(f"{npc_id} {branch_name}: node '{key}' has no text")
+            node_options = []
+            for option in node.get("options", []):
+                next_node = node_index.get(option.get("next"), NO_NODE)
+                if next_node == NO_NODE:
+                    problems.append(f"{npc_id} {branch_name}: '{key}' points at missing node '{option.get('next')}'")
+                node_options.append((option.get("response", ""), next_node))
+            texts.append(node.get("text", ""))
+            options.append(tuple(node_options))
+            seduction_changes.append(node.get("seduction_change"))
+            starts_combat.append(bool(node.get("combat", False)))
+
+        start = node_index.get("start", NO_NODE)
+        branch_starts[level] = start
+        if start == NO_NODE:
+            problems.append(f"{npc_id} {branch_name}: no 'start' node")
+            continue
+
+        # Anything not reachable from start can never be shown
+        reached = {start}
+        stack = [start]
+        while stack:
+            for _, next_node in options[stack.pop()]:
+                if next_node != NO_NODE and next_node not in reached:
+                    reached.add(next_node)
+                    stack.append(next_node)
+        for key, index in node_index.items():
+            if index not in reached:
+                problems.append(f"{npc_id} {branch_name}: node '{key}' is unreachable")
+
+    return CompiledDialogue(texts, options, seduction_changes, starts_combat, branch_starts)
+
+
+def compile_dialogues(npcs):
+    problems = []
+    dialogues = {npc_id: compile_dialogue(npc_id, npc_info.get("dialogue", {}), problems)
+                 for npc_id, npc_info in npcs.items()}
+    return dialogues, problems
+
+
+def load_dialogues(file_path, npcs):
+    # Compiles the dialogue in npcs (parsed from file_path), reusing the on-disk cache while the file is unchanged
+    with open(file_path, 'rb') as file:
+        file_hash = hashlib.sha256(file.read()).hexdigest()
+    cache_path = file_path + ".compiled"
+
+    try:
+        with open(cache_path, 'rb') as file:
+            cached = pickle.load(file)
+        if cached.get("version") == DIALOGUE_CACHE_VERSION and cached.get("hash") == file_hash:
+            return cached["dialogues"], cached["problems"]
+    except Exception:
+        pass  # Missing, stale or unreadable cache (moved classes, newer pickle protocol...), just compile
+
+    dialogues, problems = compile_dialogues(npcs)
+    # Written beside it and swapped in, so another process (the game, dialogue_explorer) never reads half a file
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            pickle.dump({"version": DIALOGUE_CACHE_VERSION, "hash": file_hash,
+                         "dialogues": dialogues, "problems": problems}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # Read-only data directory, we'll compile again next time
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return dialogues, problems
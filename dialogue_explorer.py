@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from dialogue import NO_NODE, load_dialogues
+from npcs import NPCManager, MIN_SEDUCTION_LEVEL, MAX_SEDUCTION_LEVEL
+
+# Follows the same rules as ConversationEngine, on the compiled tables instead of a running game:
+# - a conversation opens at entry_node(level), the NPCManager level, falling back to the top-level tree
+# - the player can leave ("Smell you later") at any node, and a node with no options ends it
+# - only the node it ends on applies its seduction_change, clamped to the NPCManager bounds
+# - an option pointing at a missing node ends it with no change
+# Game.end_conversation's own adjustment only touches the map NPC's copy, the next conversation never reads it
+
+
+def clamp_level(level):
+    return max(MIN_SEDUCTION_LEVEL, min(MAX_SEDUCTION_LEVEL, level))
+
+
+def explore_conversation(dialogue, level):
+    # Every path through one conversation at this level: (nodes shown, levels it can end on, broken options hit)
+    start = dialogue.entry_node(level)
+    if start == NO_NODE:
+        return set(), {level}, set()
+    reached = {start}
+    broken = set()
+    stack = [start]
+    while stack:
+        node = stack.pop()
+        for option, (_, next_node) in enumerate(dialogue.options[node]):
+            if next_node == NO_NODE:
+                broken.add((node, option))
+            elif next_node not in reached:
+                reached.add(next_node)
+                stack.append(next_node)
+    # Any node shown can be the last one, by leaving there or because it has no options
+    outcomes = {clamp_level(level + (dialogue.seduction_changes[node] or 0)) for node in reached}
+    if broken:
+        outcomes.add(level)
+    return reached, outcomes, broken
+
+
+def explore_npc(npc_id, dialogue, start_level):
+    # Breadth first over seduction levels, one conversation per step, so the first visit to a level is the fewest talks
+    conversations = {start_level: 0}
+    shown = set()
+    broken = set()
+    missing_branches = []
+    silent_levels = []
+    next_levels = {}
+    queue = deque([start_level])
+    while queue:
+        level = queue.popleft()
+        if dialogue.start_node(level) == NO_NODE:
+            missing_branches.append(level)
+        reached, outcomes, level_broken = explore_conversation(dialogue, level)
+        if not reached:
+            silent_levels.append(level)
+        shown |= reached
+        broken |= level_broken
+        next_levels[level] = outcomes
+        for outcome in outcomes:
+            if outcome not in conversations:
+                conversations[outcome] = conversations[level] + 1
+                queue.append(outcome)
+
+    # Levels you can talk an NPC into but never back out of on the way to the max
+    can_max = {MAX_SEDUCTION_LEVEL} if MAX_SEDUCTION_LEVEL in conversations else set()
+    changed = True
+    while changed:
+        changed = False
+        for level, outcomes in next_levels.items():
+            if level not in can_max and outcomes & can_max:
+                can_max.add(level)
+                changed = True
+
+    return {
+        "npc": npc_id,
+        "start_level": start_level,
+        "levels": sorted(conversations),
+        "conversations_to_max": conversations.get(MAX_SEDUCTION_LEVEL),
+        "nodes": dialogue.node_count(),
+        "reachable_nodes": len(shown),
+        "unreachable_nodes": [dialogue.texts[node] for node in range(dialogue.node_count()) if node not in shown],
+        "dead_ends": [f"{dialogue.texts[node]!r} option {option + 1} ({dialogue.options[node][option][0]!r})"
+                      for node, option in sorted(broken)],
+        "missing_branches": sorted(missing_branches),
+        "silent_levels": sorted(silent_levels),
+        "stuck_levels": sorted(level for level in conversations if level not in can_max),
+    }
+
+
+def explore_batch(batch):
+    return [explore_npc(*job) for job in batch]
+
+
+def explore_all(npcs_path, jobs=None):
+    with open(npcs_path, 'r') as file:
+        npcs = json.load(file)
+    dialogues, _ = load_dialogues(npcs_path, npcs)
+    npc_manager = NPCManager()
+    work = [(npc_id, dialogue, npc_manager.get_seduction_level(npc_id)) for npc_id, dialogue in dialogues.items()]
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(work) < 2:
+        return explore_batch(work)
+    # One batch per worker, a task per NPC would spend longer pickling than exploring
+    batches = [work[i::jobs] for i in range(jobs) if work[i::jobs]]
+    with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+        results = [result for batch in pool.map(explore_batch, batches) for result in batch]
+    order = {npc_id: i for i, (npc_id, _, _) in enumerate(work)}
+    return sorted(results, key=lambda result: order[result["npc"]])
+
+
+def format_report(result, verbose=False):
+    to_max = result["conversations_to_max"]
+    max_text = f"maxed after {to_max} conversations" if to_max is not None else f"can't reach level {MAX_SEDUCTION_LEVEL}"
+    lines = [f"[Explorer] {result['npc']}: starts at {result['start_level']}, {max_text}, "
+             f"levels {result['levels']}, {result['reachable_nodes']}/{result['nodes']} nodes reachable"]
+    if result["missing_branches"]:
+        branches = ", ".join(f"seduction_{level}" for level in result["missing_branches"])
+        lines.append(f"[Explorer]   missing branches (top-level tree used instead): {branches}")
+    if result["silent_levels"]:
+        lines.append(f"[Explorer]   no dialogue at all at levels {result['silent_levels']}")
+    if result["stuck_levels"] and to_max is not None:
+        lines.append(f"[Explorer]   levels that can't get back to {MAX_SEDUCTION_LEVEL}: {result['stuck_levels']}")
+    if result["dead_ends"]:
+        lines.append(f"[Explorer]   {len(result['dead_ends'])} options point at missing nodes")
+        if verbose:
+            lines.extend(f"[Explorer]     {dead_end}" for dead_end in result["dead_ends"])
+    if verbose and result["unreachable_nodes"]:
+        lines.extend(f"[Explorer]     never shown: {text[:60]!r}" for text in result["unreachable_nodes"])
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk every dialogue path for every NPC across repeated conversations")
+    parser.add_argument("--npcs", default="data/npcs.json", help="NPC data file")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per CPU, 1 runs inline)")
+    parser.add_argument("--json", dest="json_path", help="Also write the full results to this file")
+    parser.add_argument("--verbose", action="store_true", help="List every dead end and node that's never shown")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = explore_all(args.npcs, args.jobs)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        for line in format_report(result, args.verbose):
+            print(line)
+    shown = sum(result["reachable_nodes"] for result in results)
+    total = sum(result["nodes"] for result in results)
+    maxed = sum(result["conversations_to_max"] is not None for result in results)
+    print(f"[Explorer] {len(results)} NPCs, {shown}/{total} nodes reachable, {maxed} can be maxed out, {elapsed:.2f}s")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,89 @@
+EFFECT_DURATION = 2.0  # Seconds a rising effect stays on screen
+EFFECT_RISE_SPEED = 20  # Pixels per second
+CURVE_STEPS_PER_SECOND = 60
+
+def build_curves(duration=EFFECT_DURATION, rise_speed=EFFECT_RISE_SPEED, steps_per_second=CURVE_STEPS_PER_SECOND):
+    # Alpha and vertical offset for every step of the effect, computed once instead of per blit
+    steps = int(duration * steps_per_second) + 1
+    alpha_curve = []
+    offset_curve = []
+    for step in range(steps):
+        elapsed_time = step / steps_per_second
+        alpha_curve.append(max(0, int(255 * (1 - elapsed_time / duration))))
+        offset_curve.append(int(elapsed_time * rise_speed))
+    return alpha_curve, offset_curve
+
+
+class EffectSystem:
+    def __init__(self, screen, capacity=64, tile_size=32):
+        self.screen = screen
+        self.capacity = capacity
+        self.tile_size = tile_size
+        self.alpha_curve, self.offset_curve = build_curves()
+
+        # Fixed pool of effect slots, nothing is allocated after this
+        self.surfaces = [None] * capacity  # Shared source surfaces, never copied
+        self.world_x = [0] * capacity
+        self.world_y = [0] * capacity
+        self.start_times = [0.0] * capacity
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.active_slots = []
+
+    def spawn(self, surface, world_x, world_y, current_time):
+        # Start a rising effect at a world pixel position, dropped if the pool is full
+        if not self.free_slots:
+            return False
+        slot = self.free_slots.pop()
+        self.surfaces[slot] = surface
+        self.world_x[slot] = world_x
+        self.world_y[slot] = world_y
+        self.start_times[slot] = current_time
+        self.active_slots.append(slot)
+        return True
+
+    def clear(self):
+        for slot in self.active_slots:
+            self.surfaces[slot] = None
+            self.free_slots.append(slot)
+        self.active_slots = []
+
+    def update(self, current_time):
+        # Retire finished effects back into the pool
+        still_active = []
+        for slot in self.active_slots:
+            if current_time - self.start_times[slot] < EFFECT_DURATION:
+                still_active.append(slot)
+            else:
+                self.surfaces[slot] = None
+                self.free_slots.append(slot)
+        self.active_slots = still_active
+
+    def step_of(self, slot, current_time):
+        return min(len(self.alpha_curve) - 1, int((current_time - self.start_times[slot]) * CURVE_STEPS_PER_SECOND))
+
+    def bounds(self, camera_offset, current_time):
+        # Screen rects the next draw() will cover, so they can be cleared first
+        camera_px = camera_offset[0] * self.tile_size
+        camera_py = camera_offset[1] * self.tile_size
+        rects = []
+        for slot in self.active_slots:
+            rect = self.surfaces[slot].get_rect()
+            rect.topleft = (self.world_x[slot] - camera_px,
+                            self.world_y[slot] - camera_py - self.offset_curve[self.step_of(slot, current_time)])
+            rects.append(rect)
+        return rects
+
+    def draw(self, camera_offset, current_time):
+        # Returns the screen rect of every effect it blitted
+        camera_px = camera_offset[0] * self.tile_size
+        camera_py = camera_offset[1] * self.tile_size
+
+        rects = []
+        for slot in self.active_slots:
+            step = self.step_of(slot, current_time)
+            surface = self.surfaces[slot]
+            # The source surface is shared, so alpha is set right before each blit
+            surface.set_alpha(self.alpha_curve[step])
+            rects.append(self.screen.blit(surface, (self.world_x[slot] - camera_px,
+                                                    self.world_y[slot] - camera_py - self.offset_curve[step])))
+        return rects
@@ -1,52 +1,321 @@
 import pygame
 import json
+import os
 import random
 import time
-from queue import Queue
+import zlib
+
+import numpy as np
 
 # Import the conversation, combat, menu, and credits engines
-from conversation_engine import ConversationEngine
+from conversation_engine import ConversationEngine, portrait_path
 from combat_engine import CombatEngine
+from combat import load_combat_data
 from menu_engine import MenuEngine
 from credits_engine import CreditsEngine
+from map_renderer import MapRenderer
+from tile_map import TileMap, TILE_TYPES
+from npc_store import NPCStore
+from navigation import Navigation, nearest_walkable
+from npcs import NPCManager, MIN_SEDUCTION_LEVEL
+from save_game import SaveManager, AUTOSAVE_INTERVAL
+from transitions import TransitionIndex
+from world_format import WorldFile
+from dialogue import load_dialogues
+from text_renderer import TextRenderer
+from assets import AssetManager
+from startup import StartupPipeline
+from frame_scheduler import FrameScheduler, merge_rects
+from timers import TimerQueue
+from effects import EffectSystem
+from sim_clock import SimulationClock, STEP_DT
+from input_log import LiveInput
+from input_queue import InputQueue, INTERACT, MOVE_KEYS, held_direction
+from profiler import FrameProfiler
+
+COARSE_SIM_INTERVAL = 1.0  # Seconds between movement batches on maps next to the player's
+PORTRAIT_PRELOAD_RADIUS = 8  # Tiles around the player whose NPCs get their portraits loaded ahead of time
+PROFILER_HUD_KEY = pygame.K_F3
+TRACE_KEY = pygame.K_F4
+TILE_IMAGE_PATHS = [f"assets/{tile_type.image}.png" if tile_type.image else None for tile_type in TILE_TYPES]
 
 class Game:
-    def __init__(self, screen):
+    def __init__(self, screen, clock=None, seed=None, headless=False, save_dir=None):
         self.screen = screen
-        self.menu_engine = MenuEngine(screen)
+        self.clock = clock or SimulationClock()  # Only advanced by update(), one fixed step at a time
+        self.steps = 0  # Fixed steps run so far, recordings are timed by these
+        if seed is None:
+            seed = int.from_bytes(os.urandom(4), "little")  # Still pick one, so a recording can replay it
+        self.seed = seed
+        self.rng = random.Random(seed)  # All simulation randomness goes through here
+        self.np_rng = np.random.default_rng(seed)  # Same, for the batched NPC movement
+        self.effect_rng = random.Random(f"effects-{seed}")  # Cosmetic only, so headless runs draw the same numbers above
+        self.input = LiveInput()  # Held keys, loading and the save file; swapped for a recorder or replayer
+        self.headless = headless  # No rendering, tile images or effects
+        self.step_dt = STEP_DT
+        self.text_renderer = TextRenderer()  # Shared fonts and rendered text for every engine
+        self.assets = AssetManager()  # Shared images, decoded on a loader thread
+        if not headless:
+            self.assets.preload(path for path in TILE_IMAGE_PATHS if path)  # Decodes while the menu is up
+        self.scheduler = FrameScheduler()  # Every engine marks it dirty when its screen needs redrawing
+        self.profiler = FrameProfiler()  # Off until the HUD or a trace turns it on
+        self.hud_font = self.text_renderer.get_font(18)
+        self.input_queue = InputQueue(self.scheduler, self.profiler)  # Owns the event pump and buffered key presses
+        self.npc_manager = NPCManager()  # The one copy of seduction levels, shared with the conversation engine
+        self.save_manager = SaveManager(save_dir) if save_dir else None  # No saving unless given somewhere to save
+        self.menu_engine = MenuEngine(screen, self.text_renderer, self.scheduler)
+        self.menu_engine.continue_available = bool(self.save_manager and self.save_manager.has_save())
         self.conversation_engine = ConversationEngine(screen, self)  # Pass self as game_instance
-        self.combat_engine = CombatEngine(screen)
-        self.credits_engine = CreditsEngine(screen)
+        self.combat_engine = CombatEngine(screen, self.scheduler, self.text_renderer)
+        self.credits_engine = CreditsEngine(screen, self.scheduler)
         self.current_state = "menu"
         self.player_move_delay = 0.25
-        self.last_player_move_time = time.time()
+        self.last_player_move_time = self.clock.now()
 
         # Emojis for heart and smoke effects
-        self.heart_emoji = pygame.font.Font(None, 50).render("❤️", True, (255, 0, 0))
-        self.smoke_emoji = pygame.font.Font(None, 50).render("🌩️", True, (169, 169, 169))
+        emoji_font = self.text_renderer.get_font(50)
+        self.heart_emoji = emoji_font.render("❤️", True, (255, 0, 0))
+        self.smoke_emoji = emoji_font.render("🌩️", True, (169, 169, 169))
+        self.effects = EffectSystem(screen)
 
         self.current_npc = None  # To track the current NPC being interacted with
-        self.run_game()
+        self.combat_data = None  # Combatants and abilities from combat.json, None disables fights
+        # What the last frame put on screen, so the next one only redraws what changed
+        self.drawn_state = None
+        self.drawn_camera = None
+        self.drawn_sprites = {}  # Sprite key -> screen rect
+        self.drawn_effects = []  # Screen rects of the effects
+        self.startup = None  # Background loading started by start_loading(), if any
+        self.pending_start = None  # "new" or "continue" once chosen on the menu, until the data is ready
+        self.start_requested_at = None
+        self.npc_start_positions = None
+
+    def handle_event(self, event, timestamp=None):
+        # timestamp is when the event was pumped, for measuring how long it takes to show up on screen
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        self.input.note_event(self.steps, event)
+        if event.type == pygame.KEYDOWN and event.key in (PROFILER_HUD_KEY, TRACE_KEY):
+            self.toggle_profiling(event.key)
+            return
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.scheduler.invalidate()  # The window contents were lost
 
-    def run_game(self):
         if self.current_state == "menu":
-            self.menu_engine.start_menu()
-            self.current_state = "exploring"
+            if self.menu_engine.handle_event(event):
+                if self.menu_engine.exit_requested:
+                    self.input_queue.quit_requested = True
+            elif self.pending_start is None:
+                if self.menu_engine.options[self.menu_engine.selected_option] == "Continue":
+                    self.request_start("continue")
+                else:
+                    self.request_start("new")
+        elif self.current_state == "exploring":
+            if event.type == pygame.KEYDOWN and self.input_queue.buffer_key(event.key, timestamp):
+                return  # Run by the next fixed step, which measures it once it moves something
+        elif self.current_state == "conversation":
+            self.conversation_engine.handle_event(event)
+        elif self.current_state == "combat":
+            self.combat_engine.handle_event(event)
+
+        if event.type == pygame.KEYDOWN and self.scheduler.dirty and not self.headless:
+            self.input_queue.changed_screen(timestamp)
+
+    def toggle_profiling(self, key):
+        profiler = self.profiler
+        if key == PROFILER_HUD_KEY:
+            profiler.hud_visible = not profiler.hud_visible
+        elif profiler.trace_events is None:
+            profiler.start_trace()
+            print("[Profiler] Trace capture started")
+        else:
+            profiler.stop_trace(time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        # Stays on while either the HUD or a capture needs it
+        enabled = profiler.hud_visible or profiler.trace_events is not None
+        if enabled != profiler.enabled:
+            profiler.enable(enabled)
+        self.scheduler.invalidate()  # Clears the HUD away when it's hidden
+
+    def start_loading(self, maps_path='data/maps.json', npcs_path='data/npcs.json'):
+        # Parses, compiles and places everything on a worker while the menu is up
+        self.startup = StartupPipeline(self.data_stages(maps_path, npcs_path)).start()
+        self.menu_engine.loading_status = self.startup.status()
+
+    def request_start(self, mode):
+        self.pending_start = mode
+        self.start_requested_at = time.perf_counter()
+        self.check_pending_start()
+
+    def check_pending_start(self):
+        # Starts the chosen game as soon as the startup worker has the data ready
+        if self.startup is not None:
+            status = self.startup.status() or ("Starting..." if self.pending_start else None)
+            if status != self.menu_engine.loading_status:
+                self.menu_engine.loading_status = status
+                self.scheduler.mark_dirty()
+        if self.pending_start is None or not self.input.loading_done(self.startup, self.steps):
+            return
+        mode = self.pending_start
+        self.pending_start = None
+        if mode == "continue":
+            self.continue_game()
+        else:
+            self.start_new_game()
+
+    def finish_loading(self):
+        # Whatever the startup worker didn't do, plus the parts that need the display
+        if self.startup is None:
             self.load_assets()
-            self.setup_game()
+            return
+        self.startup.wait()
+        start = time.perf_counter()
+        self.load_images()
+        self.startup.add_timing("images", (time.perf_counter() - start) * 1000)
+        for line in self.startup.report():
+            print(line)
+        self.startup = None
+
+    def start_new_game(self):
+        self.finish_loading()
+        self.setup_game()
+        self.current_state = "exploring"
+        self.scheduler.mark_dirty()
+        self.schedule_autosave()
+
+    def continue_game(self):
+        self.finish_loading()
+        self.setup_game()
+        saved = self.input.load_save(self.save_manager)
+        if saved:
+            self.apply_save(*saved)
+        else:
+            print("[Game] No save to continue from, starting a new game.")
+        self.current_state = "exploring"
+        self.scheduler.mark_dirty()
+        self.schedule_autosave()
 
-    def load_assets(self):
-        self.maps = self.load_maps('data/maps.json')
-        self.npcs = self.load_npcs('data/npcs.json')
-        self.wall_image = pygame.image.load('assets/wall.png').convert_alpha()
-        self.door_image = pygame.image.load('assets/door.png').convert_alpha()
-        self.portal_image = pygame.image.load('assets/portal.png').convert_alpha()
-        self.floor_image = pygame.image.load('assets/floor.png').convert_alpha()
+    def schedule_autosave(self):
+        if self.save_manager:
+            self.timers.schedule(self.clock.now() + AUTOSAVE_INTERVAL, self.autosave)
+
+    def autosave(self):
+        self.save_game()
+        self.schedule_autosave()
+
+    def save_game(self, wait=False):
+        # Copies the state here, the save manager encodes and writes it on its own thread
+        if not self.save_manager or self.current_state == "menu":
+            return
+        meta = {
+            "time": self.clock.now(),
+            "current_map": self.current_map,
+            "player_pos": list(self.player_pos),
+            "map_names": self.npc_data.map_names,
+            "sim_time": self.npc_data.sim_time.tolist(),
+            "ids": self.npc_data.ids,
+            "npc_manager": self.npc_manager.save_state(),
+        }
+        self.save_manager.save(meta, self.npc_data.snapshot())
+        if wait:
+            self.save_manager.flush()
+
+    def apply_save(self, meta, rows):
+        store = self.npc_data
+        # Saved times are on the old session's clock
+        time_offset = self.clock.now() - meta["time"]
+
+        # Map names and NPC ids are matched up again, in case the data files changed since the save
+        map_lookup = np.array([store.map_indexes.get(map_name, -1) for map_name in meta["map_names"]], dtype=np.int32)
+        rows["map_index"] = map_lookup[rows["map_index"]]
+        if meta["ids"] == store.ids:
+            indexes = saved = np.arange(len(rows))
+        else:
+            saved = np.array([i for i, npc_id in enumerate(meta["ids"]) if npc_id in store.index_of], dtype=np.int64)
+            indexes = np.array([store.index_of[meta["ids"][i]] for i in saved.tolist()], dtype=np.int64)
+        on_known_map = rows["map_index"][saved] >= 0
+        saved = saved[on_known_map]
+        indexes = indexes[on_known_map]
+        store.restore(indexes, rows[saved], time_offset)
+
+        for map_index, sim_time in enumerate(meta["sim_time"]):
+            if map_lookup[map_index] >= 0:
+                store.sim_time[map_lookup[map_index]] = sim_time + time_offset
+        self.npc_manager.load_state(meta["npc_manager"])
+        if meta["current_map"] in self.maps:
+            self.change_map(meta["current_map"], list(meta["player_pos"]))
+        print(f"[Game] Continued from save with {len(indexes)} NPCs on {self.current_map}.")
+
+    def load_assets(self, maps_path='data/maps.json', npcs_path='data/npcs.json'):
+        for _, stage in self.data_stages(maps_path, npcs_path):
+            stage()
+        self.load_images()
+
+    def data_stages(self, maps_path, npcs_path):
+        # Loading steps that don't touch the display, so they can run on the startup worker
+        return [
+            ("maps", lambda: self.load_map_stage(maps_path)),
+            ("transitions", self.build_transitions),
+            ("npcs", lambda: self.load_npc_stage(npcs_path)),
+            ("dialogue", lambda: self.compile_dialogue_stage(npcs_path)),
+            ("combat", lambda: self.load_combat_stage(npcs_path)),
+            ("placement", self.place_npcs),
+        ]
+
+    def load_map_stage(self, maps_path):
+        self.maps = self.load_maps(maps_path)
+        self.navigation = Navigation(self.maps)  # Walkability, regions and distance fields, built as they're needed
+
+    def build_transitions(self):
+        self.transitions = TransitionIndex(self.maps)
+        for problem in self.transitions.problems:
+            print(f"[Game] Map transition problem: {problem}")
+
+    def load_npc_stage(self, npcs_path):
+        self.npcs = self.load_npcs(npcs_path)
+        self.npc_start_positions = None
+
+    def compile_dialogue_stage(self, npcs_path):
+        self.dialogues, dialogue_problems = load_dialogues(npcs_path, self.npcs)
+        for problem in dialogue_problems:
+            print(f"[Game] Dialogue problem: {problem}")
+        for npc_info in self.npcs.values():
+            npc_info.pop("dialogue", None)  # The compiled tables replace the raw trees
+
+    def load_combat_stage(self, npcs_path):
+        # combat.json sits next to the NPC file, without one nobody can be fought
+        combat_path = os.path.join(os.path.dirname(npcs_path), "combat.json")
+        if not os.path.exists(combat_path):
+            print(f"[Game] No {combat_path}, combat is disabled")
+            self.combat_data = None
+            return
+        try:
+            self.combat_data = load_combat_data(combat_path)
+        except (ValueError, KeyError) as error:
+            print(f"[Game] Can't use {combat_path}, combat is disabled: {error!r}")
+            self.combat_data = None
+
+    def place_npcs(self):
+        # Nearest walkable tile to each NPC's start, only depends on the data files
+        self.npc_start_positions = {npc_id: self.find_nearest_non_wall(npc_info["start_pos"], npc_info["map"])
+                                    for npc_id, npc_info in self.npcs.items()}
+
+    def load_images(self):
+        self.map_renderer = None
+        if self.headless:
+            return
+        # Indexed by tile ID, see tile_map.TILE_TYPES. Usually already decoded by the preload in __init__
+        self.tile_atlas, tile_rects = self.assets.build_atlas(TILE_IMAGE_PATHS)
+        self.map_renderer = MapRenderer(self.screen, self.tile_atlas, tile_rects)
 
     def load_maps(self, file_path):
+        if file_path.endswith('.bin'):
+            # Chunked binary world, tiles are paged in from the memory-mapped file as they're used
+            return WorldFile(file_path).maps
+
         with open(file_path, 'r') as file:
-            maps = json.load(file)
-        return maps
+            raw_maps = json.load(file)
+        # Compile each map into a typed tile grid once, the raw rows are dropped afterwards
+        return {map_name: TileMap.from_rows(map_name, rows) for map_name, rows in raw_maps.items()}
 
     def load_npcs(self, file_path):
         with open(file_path, 'r') as file:
@@ -60,10 +329,15 @@ class Game:
         self.current_dialogue = None
         self.interacting = False
         self.camera_offset = [0, 0]
+        if self.map_renderer:
+            self.map_renderer.load_map(self.current_map, self.tile_map)
 
-        self.npc_data = {}
+        self.npc_data = NPCStore(self.maps, self.navigation, len(self.npcs))  # Looked up like a dict of NPC dicts
+        self.timers = TimerQueue()  # Anything that happens at a set time, NPC moves are timed by the store
+        if self.npc_start_positions is None:
+            self.place_npcs()
         for npc_id, npc_info in self.npcs.items():
-            start_pos = self.find_nearest_non_wall(npc_info["start_pos"], npc_info["map"])
+            start_pos = self.npc_start_positions[npc_id]
             movement_range = self.get_movement_range(npc_info["movement_level"])
             first_name = npc_info["name"].split()[0]  # Extract the first name
 
@@ -75,152 +349,133 @@ class Game:
                 except ValueError:
                     seduction_level = -99  # Fallback if conversion fails
 
-            self.npc_data[npc_id] = {
-                "name": first_name,
-                "pos": start_pos,
-                "start_pos": start_pos[:],
-                "last_move_time": time.time(),
-                "move_interval": random.uniform(2, 4),  # Random interval between 2 to 4 seconds
-                "movement_level": npc_info["movement_level"],
-                "movement_range": movement_range,
-                "dialogue": npc_info["dialogue"],
-                "current_dialogue": "start",
-                "color": npc_info["color"],
-                "moving": True,
-                "map": npc_info["map"],
-                "move_count": 0,
-                "return_to_start": False,
-                "seduction_level": seduction_level,
-                "effect_start_time": None,
-                "effect_type": None
-            }
+            last_move_time = self.clock.now()
+            move_interval = self.rng.uniform(2, 4)  # Random interval between 2 to 4 seconds
+            self.npc_data.add(npc_id, first_name, npc_info["map"], start_pos, movement_range,
+                              npc_info["movement_level"], self.dialogues[npc_id], npc_info["color"],
+                              seduction_level, last_move_time, move_interval)
+        self.npc_data.sim_time[:] = self.clock.now()
+        self.update_sim_tiers()
+        self.preload_nearby_portraits()
 
     def update(self):
-        if self.current_state == "exploring":
-            self.handle_exploration()
-            self.handle_npc_movement()
+        # Advance the simulation by exactly one fixed step
+        self.clock.advance(self.step_dt)
+        if self.current_state == "menu":
+            self.check_pending_start()
+        if self.current_state in ("exploring", "conversation"):
+            # The world keeps ticking behind the dialogue box, only the player stands still
+            if self.current_state == "exploring":
+                with self.profiler.span("exploration"):
+                    self.handle_exploration()
+            with self.profiler.span("npc_movement"):
+                self.handle_npc_movement()
+            if not self.headless:
+                with self.profiler.span("update_effects"):
+                    self.update_effects()
+        if not self.headless and self.assets.poll() and self.current_state == "conversation":
+            self.scheduler.mark_dirty()  # A portrait may have finished loading
+        self.steps += 1
 
     def handle_exploration(self):
-        keys = pygame.key.get_pressed()
-        current_time = time.time()
-        if not self.interacting and current_time - self.last_player_move_time >= self.player_move_delay:
-            if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-                self.move_player(-1, 0)
-            if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-                self.move_player(1, 0)
-            if keys[pygame.K_UP] or keys[pygame.K_w]:
-                self.move_player(0, -1)
-            if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-                self.move_player(0, 1)
-            self.last_player_move_time = current_time
-
-        if keys[pygame.K_SPACE] and not self.interacting:
-            npc = self.check_for_npc_interaction()
-            if npc:
-                self.current_npc = npc  # Track the current NPC
-                self.current_state = "conversation"
-                self.conversation_engine.start_conversation(npc, self.end_conversation)
+        held = self.input.held_keys(self.steps)
+        if self.interacting:
+            return
+        ready = self.clock.now() - self.last_player_move_time >= self.player_move_delay
+
+        # Buffered presses first and in the order they came, so a tap between two frames still counts.
+        # A move waits for the move delay, and anything pressed after it waits behind it
+        actions = self.input_queue.actions
+        while actions:
+            timestamp, kind, dx, dy = actions[0]
+            if kind == INTERACT:
+                actions.popleft()
+                if self.interact(timestamp):
+                    return
+            elif ready:
+                actions.popleft()
+                self.step_player(dx, dy, timestamp)
+                return
+            else:
+                return
+
+        # Nothing buffered, holding a key keeps moving once per move delay
+        if ready:
+            dx, dy = held_direction(held)
+            if dx or dy:
+                self.step_player(dx, dy)
+
+    def step_player(self, dx, dy, timestamp=None):
+        # The delay restarts on every attempted move, even into a wall, but not on steps with no key down
+        self.last_player_move_time = self.clock.now()
+        if self.move_player(dx, dy) and timestamp is not None and not self.headless:
+            self.input_queue.changed_screen(timestamp)
+
+    def interact(self, timestamp):
+        npc = self.check_for_npc_interaction()
+        if not npc:
+            return False
+        self.current_npc = npc  # Track the current NPC
+        self.current_state = "conversation"
+        self.input_queue.clear_actions()  # Presses made before talking don't carry on after it
+        self.scheduler.mark_dirty()
+        self.conversation_engine.start_conversation(npc, self.end_conversation)
+        if not self.headless:
+            self.input_queue.changed_screen(timestamp)
+        return True
 
     def check_for_npc_interaction(self):
-        # Check if the player is adjacent to any NPC
-        adjacent_positions = [
-            (self.player_pos[0] - 1, self.player_pos[1]),
-            (self.player_pos[0] + 1, self.player_pos[1]),
-            (self.player_pos[0], self.player_pos[1] - 1),
-            (self.player_pos[0], self.player_pos[1] + 1)
-        ]
-        for npc_id, npc in self.npc_data.items():
-            if npc["map"] == self.current_map and tuple(npc["pos"]) in adjacent_positions:
-                full_npc_data = {
-                    "id": npc_id,
-                    "name": npc_id.replace("_", " ").title(),
-                    **npc
-                }
-                return full_npc_data
-        return None
+        # The first NPC next to the player, as a view on the store so what the conversation changes sticks
+        adjacent = self.npc_data.adjacent(self.current_map, self.player_pos[0], self.player_pos[1])
+        return self.npc_data[adjacent[0]] if adjacent else None
+
+    def update_sim_tiers(self):
+        # The player's map is simulated every step, maps one door away once a second, the rest are frozen
+        self.nearby_maps = [self.npc_data.map_indexes[map_name]
+                            for map_name in sorted(self.transitions.graph.get(self.current_map, ()))
+                            if map_name != self.current_map]
+        self.coarse_turn = 0
+        self.next_coarse_time = self.clock.now() + self.coarse_spacing()
+
+    def coarse_spacing(self):
+        # Nearby maps take turns, so each still moves once per COARSE_SIM_INTERVAL but never two on the same step
+        return COARSE_SIM_INTERVAL / max(1, len(self.nearby_maps))
 
     def handle_npc_movement(self):
-        current_time = time.time()
-        for npc_id, npc in self.npc_data.items():
-            if current_time - npc["last_move_time"] >= npc["move_interval"]:
-                if npc["return_to_start"]:
-                    self.move_npc_towards_start(npc)
-                else:
-                    self.move_npc_randomly(npc)
-
-                npc["last_move_time"] = current_time
-                npc["move_count"] += 1
-
-                if npc["move_count"] >= 3:
-                    npc["return_to_start"] = True
-                else:
-                    npc["move_interval"] = random.uniform(2, 4)
-
-    def move_npc_randomly(self, npc):
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        valid_directions = []
-        start_x, start_y = npc["start_pos"]
-        max_distance = npc["movement_range"]
-
-        for dx, dy in directions:
-            new_x, new_y = npc["pos"][0] + dx, npc["pos"][1] + dy
-            if (0 <= new_x < len(self.tile_map[0]) and
-                0 <= new_y < len(self.tile_map) and
-                self.tile_map[new_y][new_x] != '1' and  # Not a wall
-                (new_x, new_y) != tuple(self.player_pos) and  # Not the player's position
-                not any((new_x, new_y) == tuple(other_npc["pos"]) for other_npc in self.npc_data.values())):  # Not another NPC
-                distance_from_start = abs(new_x - start_x) + abs(new_y - start_y)
-                if distance_from_start <= max_distance:
-                    valid_directions.append((dx, dy))
-
-        if valid_directions:
-            direction = random.choice(valid_directions)
-            npc["pos"][0] += direction[0]
-            npc["pos"][1] += direction[1]
-
-    def move_npc_towards_start(self, npc):
-        start_x, start_y = npc["start_pos"]
-        npc_x, npc_y = npc["pos"]
-
-        dx = 0 if npc_x == start_x else (1 if start_x > npc_x else -1)
-        dy = 0 if npc_y == start_y else (1 if start_y > npc_y else -1)
-
-        new_x = npc["pos"][0] + dx
-        new_y = npc["pos"][1] + dy
-
-        if (0 <= new_x < len(self.tile_map[0]) and
-            0 <= new_y < len(self.tile_map) and
-            self.tile_map[new_y][new_x] != '1' and  # Not a wall
-            (new_x, new_y) != tuple(self.player_pos) and  # Not the player's position
-            not any((new_x, new_y) == tuple(other_npc["pos"]) for other_npc in self.npc_data.values())):  # Not another NPC
-            npc["pos"][0] = new_x
-            npc["pos"][1] = new_y
-        else:
-            npc["move_count"] = 0
-            npc["return_to_start"] = False
+        # Every NPC on the player's map that's due this step moves in one batch
+        current_time = self.clock.now()
+        self.timers.run_due(current_time)
+        store = self.npc_data
+        active_map = store.map_indexes[self.current_map]
+        due = store.due(current_time, active_map)
+        store.sim_time[active_map] = current_time
+
+        if current_time >= self.next_coarse_time and self.nearby_maps:
+            self.next_coarse_time = current_time + self.coarse_spacing()
+            map_index = self.nearby_maps[self.coarse_turn % len(self.nearby_maps)]
+            self.coarse_turn += 1
+            store.fast_forward(map_index, current_time, self.np_rng, self.current_map, self.player_pos,
+                               step=COARSE_SIM_INTERVAL)
+
+        if not len(due):
+            return
 
-    def find_nearest_non_wall(self, start_pos, map_name):
-        queue = Queue()
-        queue.put(start_pos)
-        visited = set()
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-
-        while not queue.empty():
-            x, y = queue.get()
-            if (x, y) in visited:
-                continue
-            visited.add((x, y))
+        if self.current_npc and self.current_npc["id"] in store:
+            # Don't wander off mid-conversation, check again after another interval
+            talking = store.index_of[self.current_npc["id"]]
+            if talking in due:
+                self.schedule_npc(self.current_npc["id"], current_time + store.move_interval[talking])
+                due = due[due != talking]
 
-            if self.maps[map_name][y][x] != '1':
-                return [x, y]
+        moved = store.step(due, current_time, self.np_rng, self.current_map, self.player_pos)
+        if len(moved):
+            self.scheduler.mark_dirty()
 
-            for dx, dy in directions:
-                new_x = x + dx
-                new_y = y + dy
-                if 0 <= new_x < len(self.maps[map_name][0]) and 0 <= new_y < len(self.maps[map_name]):
-                    queue.put((new_x, new_y))
+    def schedule_npc(self, npc_id, when):
+        self.npc_data.schedule(np.array([self.npc_data.index_of[npc_id]]), np.array([when]))
 
-        return start_pos
+    def find_nearest_non_wall(self, start_pos, map_name):
+        return nearest_walkable(self.maps[map_name], start_pos)
 
     def get_movement_range(self, movement_level):
         if movement_level == "toodling":
@@ -233,39 +488,57 @@ class Game:
             return 5  # Default to 5 tiles if undefined
 
     def move_player(self, dx, dy):
-        new_x = self.player_pos[0] + dx
-        new_y = self.player_pos[1] + dy
-
-        if (0 <= new_x < len(self.tile_map[0]) and
-            0 <= new_y < len(self.tile_map) and
-            self.tile_map[new_y][new_x] != '1' and  # Not a wall
-            not any((new_x, new_y) == tuple(npc["pos"]) for npc in self.npc_data.values())):  # Not an NPC
-            self.player_pos = [new_x, new_y]
+        # A diagonal tries each axis in turn, so it still slides along walls, but the camera only moves once.
+        # Returns True if the player moved
+        moved = False
+        for step_x, step_y in ((dx, 0), (0, dy)):
+            if not (step_x or step_y):
+                continue
+            new_x = self.player_pos[0] + step_x
+            new_y = self.player_pos[1] + step_y
+            if (self.tile_map.is_walkable(new_x, new_y) and  # In bounds and not a wall
+                not self.npc_data.is_occupied(self.current_map, new_x, new_y)):  # Not an NPC
+                self.player_pos = [new_x, new_y]
+                moved = True
+
+                transition = self.transitions.lookup(self.current_map, new_x, new_y)
+                if transition:
+                    map_name, arrival = transition
+                    self.change_map(map_name, list(arrival))  # Moves the camera itself
+                    return True
+
+        if moved:
             self.update_camera()
-
-            tile = self.tile_map[new_y][new_x]
-            if tile.startswith('D['):
-                map_name = self.parse_map_transition(tile)
-                self.change_map(map_name, self.get_door_position(map_name, f'D[{self.current_map}]'))
-            elif tile.startswith('P['):
-                map_name = self.parse_map_transition(tile)
-                self.change_map(map_name, self.get_door_position(map_name, f'P[{self.current_map}]'))
-
-    def parse_map_transition(self, tile):
-        return tile[tile.index('[') + 1:tile.index(']')]
+            self.scheduler.mark_dirty()
+            self.preload_nearby_portraits()
+        return moved
 
     def change_map(self, new_map, start_position):
         self.current_map = new_map
         self.tile_map = self.maps[new_map]
+        if self.map_renderer:
+            self.map_renderer.load_map(new_map, self.tile_map)
+        self.effects.clear()
+        self.scheduler.invalidate()  # Even with the camera in the same place, it's looking at another map
         self.player_pos = start_position
+
+        # The new map's NPCs were frozen or only coarsely simulated, catch them up to now
+        self.npc_data.fast_forward(self.npc_data.map_indexes[new_map], self.clock.now(), self.np_rng,
+                                   new_map, self.player_pos)
+        self.update_sim_tiers()
         self.update_camera()
+        self.scheduler.mark_dirty()
+        self.preload_nearby_portraits()
 
-    def get_door_position(self, map_name, door_type):
-        for y, row in enumerate(self.maps[map_name]):
-            for x, tile in enumerate(row):
-                if tile == door_type:
-                    return [x, y]
-        return [1, 1]
+    def preload_nearby_portraits(self):
+        # NPCs the player could talk to soon, so starting a conversation never waits on the disk
+        if self.headless:
+            return
+        radius = PORTRAIT_PRELOAD_RADIUS
+        store = self.npc_data
+        nearby = self.npc_data.in_rect(self.current_map, self.player_pos[0] - radius, self.player_pos[1] - radius,
+                                       radius * 2 + 1, radius * 2 + 1)
+        self.assets.preload(portrait_path(store.names[store.index_of[npc_id]]) for npc_id in nearby)
 
     def update_camera(self):
         screen_width, screen_height = self.screen.get_size()
@@ -276,134 +549,272 @@ class Game:
         half_visible_x = visible_tiles_x // 2
         half_visible_y = visible_tiles_y // 2
 
-        self.camera_offset[0] = max(0, min(self.player_pos[0] - half_visible_x, len(self.tile_map[0]) - visible_tiles_x))
-        self.camera_offset[1] = max(0, min(self.player_pos[1] - half_visible_y, len(self.tile_map) - visible_tiles_y))
+        self.camera_offset[0] = max(0, min(self.player_pos[0] - half_visible_x, self.tile_map.width - visible_tiles_x))
+        self.camera_offset[1] = max(0, min(self.player_pos[1] - half_visible_y, self.tile_map.height - visible_tiles_y))
+
+        # Warm up the tiles around the view before the renderer and NPCs touch them
+        self.tile_map.prefetch_rect(self.camera_offset[0] - half_visible_x, self.camera_offset[1] - half_visible_y,
+                                    visible_tiles_x * 2, visible_tiles_y * 2)
 
     def render(self):
+        # Only what changed is redrawn and pushed to the display, unless the whole screen is stale
+        full = self.scheduler.full_redraw or self.current_state != self.drawn_state
+        self.drawn_state = self.current_state
         if self.current_state == "exploring":
-            self.render_exploration()
+            self.render_exploration(full)
+            if self.start_requested_at is not None:
+                print(f"[Startup] Menu choice to first playable frame: {(time.perf_counter() - self.start_requested_at) * 1000:.1f} ms")
+                self.start_requested_at = None
         elif self.current_state == "conversation":
-            self.conversation_engine.render_conversation()
+            with self.profiler.span("conversation"):
+                self.render_exploration(full, self.conversation_engine)
         elif self.current_state == "combat":
             self.combat_engine.render()
         elif self.current_state == "menu":
-            self.menu_engine.render()
+            self.menu_engine.render(full)
         elif self.current_state == "credits":
             self.credits_engine.render()
 
-    def render_exploration(self):
-        self.screen.fill((0, 0, 0))
-        self.draw_map()
-
-        # Draw the player
-        pygame.draw.rect(self.screen, (0, 255, 0), pygame.Rect(
-            (self.player_pos[0] - self.camera_offset[0]) * 32,
-            (self.player_pos[1] - self.camera_offset[1]) * 32,
-            32, 32))
+        if self.profiler.hud_visible:
+            # Drawn over whatever the state just presented, so only its own area needs pushing out
+            pygame.display.update(self.profiler.draw_hud(self.screen, self.text_renderer, self.hud_font))
+        self.input_queue.frame_presented()
+
+    def render_exploration(self, full, ui=None):
+        # The map and NPCs, with ui's overlays (the dialogue box) on top. A scrolled camera means a full redraw
+        overlays = ui.overlays() if ui else []
+        if full or self.camera_offset != self.drawn_camera:
+            self.draw_exploration(overlays)
+            with self.profiler.span("flip"):
+                pygame.display.flip()
+        else:
+            rects = self.draw_exploration_damage(overlays, ui is not None and ui.changed)
+            if rects:
+                with self.profiler.span("flip"):
+                    pygame.display.update(rects)
+        if ui:
+            ui.changed = False
+        self.drawn_camera = list(self.camera_offset)
+
+    def exploration_sprites(self):
+        # (key, screen rect, draw function, args) for the player and every NPC in view, in drawing order
+        sprites = []
+        player_rect = pygame.Rect((self.player_pos[0] - self.camera_offset[0]) * 32,
+                                  (self.player_pos[1] - self.camera_offset[1]) * 32, 32, 32)
+        sprites.append((None, player_rect, pygame.draw.rect, (self.screen, (0, 255, 0), player_rect)))
 
         # Font for NPC names
-        font = pygame.font.Font(None, 24)
-
-        # Draw the NPCs with their names
-        for npc_id, npc in self.npc_data.items():
-            if npc["map"] == self.current_map:
-                # Draw the NPC
-                npc_rect = pygame.Rect(
-                    (npc["pos"][0] - self.camera_offset[0]) * 32,
-                    (npc["pos"][1] - self.camera_offset[1]) * 32,
-                    32, 32
-                )
-                pygame.draw.rect(self.screen, npc["color"], npc_rect)
-
-                # Render the NPC's first name
-                name_surface = font.render(npc["name"], True, (255, 255, 255))
-                name_rect = name_surface.get_rect(center=npc_rect.center)
-
-                # Blit the name onto the NPC's sprite
-                self.screen.blit(name_surface, name_rect)
-
-                # Render the effects (hearts or smoke)
-                self.render_effects(npc, npc_rect)
-
-        pygame.display.flip()
-
-    def render_effects(self, npc, npc_rect):
-        current_time = time.time()
-
-        # Skip rendering effects if seduction level is -99 (non-seducible)
+        font = self.text_renderer.get_font(24)
+
+        # The NPCs in view with their names
+        visible_tiles_x = self.screen.get_width() // 32 + 1
+        visible_tiles_y = self.screen.get_height() // 32 + 1
+        for npc_id in self.npc_data.in_rect(self.current_map, self.camera_offset[0], self.camera_offset[1],
+                                            visible_tiles_x, visible_tiles_y):
+            npc = self.npc_data[npc_id]
+            npc_rect = pygame.Rect(
+                (npc["pos"][0] - self.camera_offset[0]) * 32,
+                (npc["pos"][1] - self.camera_offset[1]) * 32,
+                32, 32
+            )
+            # The NPC's first name, centred on its sprite
+            name_surface = self.text_renderer.render(npc["name"], font, (255, 255, 255))
+            name_rect = name_surface.get_rect(center=npc_rect.center)
+            sprites.append((npc_id, npc_rect.union(name_rect), self.draw_npc,
+                            (npc["color"], npc_rect, name_surface, name_rect)))
+        return sprites
+
+    def draw_npc(self, color, npc_rect, name_surface, name_rect):
+        pygame.draw.rect(self.screen, color, npc_rect)
+        self.screen.blit(name_surface, name_rect)
+
+    def draw_exploration(self, overlays=()):
+        profiler = self.profiler
+        self.screen.fill((0, 0, 0))
+        with profiler.span("draw_map"):
+            self.draw_map()
+
+        with profiler.span("npc_names"):
+            sprites = self.exploration_sprites()
+            for _, _, draw, args in sprites:
+                draw(*args)
+        if profiler.enabled:
+            profiler.count("npcs", len(sprites) - 1)
+            profiler.count("text", len(sprites) - 1)
+            profiler.count("blits", len(sprites) - 1)
+
+        # Render the effects (hearts or smoke)
+        with profiler.span("effects"):
+            self.drawn_effects = self.effects.draw(self.camera_offset, self.clock.now())
+        for _, _, draw, args in overlays:
+            draw(*args)
+        if profiler.enabled:
+            profiler.count("blits", len(self.drawn_effects))
+        self.drawn_sprites = {key: rect for key, rect, _, _ in sprites}
+        self.drawn_sprites.update((("ui", key), rect) for key, rect, _, _ in overlays)
+
+    def draw_exploration_damage(self, overlays=(), overlays_changed=False):
+        # Redraws only around sprites that moved, appeared or went, plus every effect. Returns the screen rects touched
+        profiler = self.profiler
+        current_time = self.clock.now()
+        with profiler.span("npc_names"):
+            layers = self.exploration_sprites()
+        sprite_count = len(layers)
+        layers += [(("ui", key), rect, draw, args) for key, rect, draw, args in overlays]
+
+        # Effects fade every frame, so wherever they were and wherever they'll be is always damaged
+        damage = self.drawn_effects + self.effects.bounds(self.camera_offset, current_time)
+        current = {}
+        for key, rect, _, _ in layers:
+            current[key] = rect
+            drawn = self.drawn_sprites.get(key)
+            if drawn != rect:
+                damage.append(rect)
+                if drawn is not None:
+                    damage.append(drawn)
+        if overlays_changed:
+            damage.extend(rect for _, rect, _, _ in overlays)
+        damage.extend(rect for key, rect in self.drawn_sprites.items() if key not in current)
+        self.drawn_sprites = current
+        if not damage:
+            self.drawn_effects = []
+            return []
+
+        # Anything overlapping the damage is redrawn whole, so its own area has to be cleared too.
+        # Checked against the merged rects, which can cover more than the pieces they were made from
+        screen_rect = self.screen.get_rect()
+        damage = merge_rects(damage, screen_rect)
+        redraw = [False] * len(layers)
+        spreading = True
+        while spreading:
+            spreading = False
+            for i, (_, rect, _, _) in enumerate(layers):
+                if not redraw[i] and rect.collidelist(damage) != -1:
+                    redraw[i] = True
+                    damage.append(rect)
+                    spreading = True
+            if spreading:
+                damage = merge_rects(damage, screen_rect)
+
+        with profiler.span("draw_map"):
+            for rect in damage:
+                self.screen.fill((0, 0, 0), rect)
+                chunk_blits = self.map_renderer.draw(self.camera_offset, rect)
+                if profiler.enabled:
+                    profiler.count("blits", chunk_blits)
+        with profiler.span("npc_names"):
+            for i in range(sprite_count):
+                if redraw[i]:
+                    layers[i][2](*layers[i][3])
+        with profiler.span("effects"):
+            self.drawn_effects = self.effects.draw(self.camera_offset, current_time)
+        for i in range(sprite_count, len(layers)):
+            if redraw[i]:
+                layers[i][2](*layers[i][3])
+        if profiler.enabled:
+            redrawn = sum(redraw[:sprite_count])
+            profiler.count("npcs", sprite_count - 1)
+            profiler.count("text", redrawn)
+            profiler.count("blits", redrawn + len(self.drawn_effects))
+        return damage
+
+    def state_checksum(self):
+        # CRC of everything the simulation decides, for checking a replay ended up where the recording did
+        if self.current_state == "menu":
+            return zlib.crc32(f"menu {self.steps}".encode())
+        checksum = zlib.crc32(self.npc_data.snapshot().tobytes())
+        levels = sorted((npc_id, npc["seduction_level"]) for npc_id, npc in self.npc_manager.npcs.items())
+        return zlib.crc32(repr((self.steps, self.current_map, self.player_pos, self.current_state, levels)).encode(), checksum)
+
+    def is_idle(self):
+        # True when nothing is animating or waiting to be drawn, so the main loop can sleep until input
+        if self.scheduler.dirty or self.pending_start:
+            return False
+        if self.current_state in ("exploring", "conversation") and self.effects.active_slots:
+            return False  # Effects animate every frame
+        if self.current_state == "exploring":
+            if self.input_queue.actions:
+                return False  # Buffered presses still waiting on the move delay
+            keys = pygame.key.get_pressed()
+            if any(keys[key] for key in MOVE_KEYS):
+                return False  # Held keys keep moving the player without sending new events
+        return True
+
+    def update_effects(self):
+        current_time = self.clock.now()
+        self.effects.update(current_time)
+        if self.effects.active_slots:
+            self.scheduler.mark_dirty()  # Effects animate every frame
+
+        # Only NPCs in view spawn effects
+        visible_tiles_x = self.screen.get_width() // 32 + 1
+        visible_tiles_y = self.screen.get_height() // 32 + 1
+        for npc_id in self.npc_data.in_rect(self.current_map, self.camera_offset[0], self.camera_offset[1],
+                                            visible_tiles_x, visible_tiles_y):
+            self.spawn_npc_effect(self.npc_data[npc_id], current_time)
+
+    def spawn_npc_effect(self, npc, current_time):
+        # Skip effects if seduction level is -99 (non-seducible)
         seduction_level = npc.get("seduction_level", -99)
-        
+
         if seduction_level == -99:
             return
-        
+
         if seduction_level >= 3:
-            # Render hearts when fully seduced
-            if "effect_start_time" not in npc or current_time - npc["effect_start_time"] > random.uniform(1.5, 2.5):
-                npc["effect_start_time"] = current_time
-                npc["effect_type"] = "heart"
-                self.create_rising_effect(npc_rect, self.heart_emoji)
+            # Hearts when fully seduced
+            effect_type, emoji = "heart", self.heart_emoji
         elif seduction_level < 0:
-            # Render smoke when seduction level is below 0
-            if "effect_start_time" not in npc or current_time - npc["effect_start_time"] > random.uniform(1.5, 2.5):
-                npc["effect_start_time"] = current_time
-                npc["effect_type"] = "smoke"
-                self.create_rising_effect(npc_rect, self.smoke_emoji)
-
-    def create_rising_effect(self, npc_rect, emoji_surface):
-        start_x = npc_rect.centerx
-        start_y = npc_rect.top - 10
-        effect_surface = emoji_surface.copy()
-        effect_start_time = time.time()
-
-        while time.time() - effect_start_time < 2:  # The effect lasts 2 seconds
-            current_time = time.time()
-            elapsed_time = current_time - effect_start_time
-            fade = max(0, int(255 * (1 - elapsed_time / 2)))
-            effect_surface.set_alpha(fade)
-
-            self.screen.blit(effect_surface, (start_x, start_y - int(elapsed_time * 20)))
-            pygame.display.flip()
-            pygame.time.delay(50)  # Delay to create the floating effect
+            # Smoke when seduction level is below 0
+            effect_type, emoji = "smoke", self.smoke_emoji
+        else:
+            return
+
+        if npc["effect_start_time"] is None or current_time - npc["effect_start_time"] > npc["effect_interval"]:
+            npc["effect_start_time"] = current_time
+            npc["effect_interval"] = self.effect_rng.uniform(1.5, 2.5)
+            npc["effect_type"] = effect_type
+            # Effects rise from just above the NPC's tile, in world pixels
+            self.effects.spawn(emoji, npc["pos"][0] * 32 + 16, npc["pos"][1] * 32 - 10, current_time)
 
     def end_conversation(self):
         print("[Game] Conversation ended, returning to exploration mode.")
         
         if self.current_npc:
-            try:
-                # Convert seduction_level to an integer if it is not already
-                current_level = int(self.current_npc.get("seduction_level", -99))
-            except ValueError:
-                current_level = -99  # Default to -99 if the conversion fails
-
-            # Adjust seduction level based on player's choices
-            seduction_change = self.conversation_engine.npc.get("seduction_change", 0)
-            new_seduction_level = current_level + seduction_change
-            self.current_npc["seduction_level"] = min(max(new_seduction_level, -1), 3)  # Clamp between -1 and 3
-
-            # Update the NPC's dialogue level based on the new seduction level
-            self.current_npc["current_dialogue"] = f"seduction_{self.current_npc['seduction_level']}"
-            if seduction_change > 0:
-                print(f"[Game] Seduction level increased to {self.current_npc['seduction_level']}.")
-            elif seduction_change < 0:
-                print(f"[Game] Seduction level decreased to {self.current_npc['seduction_level']}.")
-
+            # The conversation engine applied the dialogue's changes to the NPCManager, copy the result into the
+            # store through the view, that's where the effects read it from
+            current_level = self.current_npc["seduction_level"]
+            new_seduction_level = self.npc_manager.get_seduction_level(self.current_npc["id"])
+            if new_seduction_level != MIN_SEDUCTION_LEVEL:  # Non-seducible NPCs stay that way
+                new_seduction_level = min(max(new_seduction_level, -1), 3)  # Clamp between -1 and 3
+            self.current_npc["seduction_level"] = new_seduction_level
+            if new_seduction_level > current_level:
+                print(f"[Game] Seduction level increased to {new_seduction_level}.")
+            elif new_seduction_level < current_level:
+                print(f"[Game] Seduction level decreased to {new_seduction_level}.")
+
+        npc_id = self.current_npc["id"] if self.current_npc else None
         self.current_npc = None  # Clear the current NPC after the conversation ends
         self.current_state = "exploring"
+        self.scheduler.mark_dirty()
         self.interacting = False
+        if self.conversation_engine.combat_requested and npc_id:
+            self.start_combat(npc_id)
+
+    def start_combat(self, npc_id):
+        if self.combat_data is None or npc_id not in self.combat_data.combatants:
+            print(f"[Game] {npc_id} has no combat stats, skipping the fight")
+            return
+        self.current_state = "combat"
+        self.scheduler.mark_dirty()
+        self.combat_engine.start_combat(self.combat_data, npc_id, self.np_rng, self.end_combat)
+
+    def end_combat(self, result):
+        print(f"[Game] Combat ended ({result}), returning to exploration mode.")
+        self.current_state = "exploring"
+        self.scheduler.mark_dirty()
 
     def draw_map(self):
-        for y in range(len(self.tile_map)):
-            for x in range(len(self.tile_map[y])):
-                tile = self.tile_map[y][x]
-                draw_x = (x - self.camera_offset[0]) * 32
-                draw_y = (y - self.camera_offset[1]) * 32
-
-                if 0 <= draw_x < self.screen.get_width() and 0 <= draw_y < self.screen.get_height():
-                    if tile == '1':
-                        self.screen.blit(self.wall_image, (draw_x, draw_y))
-                    elif tile == '0':
-                        self.screen.blit(self.floor_image, (draw_x, draw_y))
-                    elif tile.startswith('D['):
-                        self.screen.blit(self.door_image, (draw_x, draw_y))
-                    elif tile.startswith('P['):
-                        self.screen.blit(self.portal_image, (draw_x, draw_y))
+        # The static tile layer is prebaked into chunks, only the ones in view get blitted
+        chunk_blits = self.map_renderer.draw(self.camera_offset)
+        if self.profiler.enabled:
+            self.profiler.count("blits", chunk_blits)
@@ -0,0 +1,47 @@
+import pygame
+
+IDLE_TIMEOUT_MS = 250  # Longest the loop sleeps waiting for input when nothing needs drawing
+
+class FrameScheduler:
+    def __init__(self, idle_timeout_ms=IDLE_TIMEOUT_MS):
+        self.idle_timeout_ms = idle_timeout_ms
+        self.dirty = True  # Something on screen changed since the last frame was drawn
+        self.full_redraw = True  # The whole screen is stale, not just the parts engines track themselves
+        self.frames_drawn = 0
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def invalidate(self):
+        # For when everything on screen has to be drawn again, not just what changed
+        self.dirty = True
+        self.full_redraw = True
+
+    def frame_drawn(self):
+        self.dirty = False
+        self.full_redraw = False
+        self.frames_drawn += 1
+
+    def wait_for_events(self):
+        # Block until input arrives or the timeout passes, so static screens sleep instead of spinning
+        event = pygame.event.wait(self.idle_timeout_ms)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+
+def merge_rects(rects, bounds):
+    # Clips rects to bounds and joins any that overlap, so nothing is cleared or pushed to the display twice
+    merged = []
+    for rect in rects:
+        rect = rect.clip(bounds)
+        if not rect:
+            continue
+        # Swallow every merged rect this one touches, the union can touch more so keep going until it doesn't
+        hit = rect.collidelist(merged)
+        while hit != -1:
+            rect = rect.union(merged.pop(hit))
+            hit = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
@@ -0,0 +1,44 @@
+import os
+import argparse
+import time
+
+# The dummy driver gives us a display surface without opening a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from engine import Game
+from input_log import parse_seed
+
+
+def create_headless_game(seed=None):
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    game = Game(screen, seed=seed, headless=True)
+    game.start_new_game()
+    return game
+
+
+def run_headless(seconds, seed=None, game=None):
+    # Step the world for the given amount of simulated time as fast as the CPU allows
+    game = game or create_headless_game(seed)
+    steps = int(seconds / game.step_dt)
+    for _ in range(steps):
+        game.update()
+    return game
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the world simulation with no display")
+    parser.add_argument("--seconds", type=float, default=3600, help="Simulated seconds to run")
+    parser.add_argument("--seed", type=parse_seed, default=0, help="Seed for the simulation RNG")
+    args = parser.parse_args()
+
+    game = create_headless_game(args.seed)
+    wall_start = time.perf_counter()
+    run_headless(args.seconds, game=game)
+    wall_time = time.perf_counter() - wall_start
+
+    print(f"[Headless] Simulated {args.seconds:.0f}s in {wall_time:.2f}s ({args.seconds / wall_time:.0f}x real time)")
+    for npc_id, npc in game.npc_data.items():
+        print(f"[Headless] {npc_id}: {npc['map']} {npc['pos']}")
+    pygame.quit()
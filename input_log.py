@@ -0,0 +1,185 @@
+import argparse
+import struct
+
+import pygame
+
+from save_game import FULL_SAVE, encode_save, decode_save
+
+RECORDING_MAGIC = b"RPGR"
+RECORDING_VERSION = 2  # 2: exploration presses are buffered from key events, so version 1 input plays back differently
+# magic, version, seed, whether Continue was available on the menu
+RECORDING_HEADER = struct.Struct("<4sHIB")
+# fixed step it happened before, kind, value
+RECORD = struct.Struct("<IBI")
+MAX_SEED = 2 ** 32 - 1  # The header stores the seed as a uint32
+KEY_DOWN = 0
+KEY_UP = 1
+HELD_KEYS = 2  # Value is a bitmask over MOVEMENT_KEYS, written whenever it changes
+LOADING_DONE = 3  # The startup worker was seen to have finished
+LOADED_SAVE = 4  # Value is the length of an encoded save that follows the record
+END = 5  # Value is a CRC of the game state when recording stopped
+# Keys the game can read as held rather than as events, recorded as bits in this order (append only)
+MOVEMENT_KEYS = (pygame.K_LEFT, pygame.K_a, pygame.K_RIGHT, pygame.K_d,
+                 pygame.K_UP, pygame.K_w, pygame.K_DOWN, pygame.K_s, pygame.K_SPACE)
+
+
+def parse_seed(text):
+    # argparse type for --seed: has to fit the recording header, and numpy rejects negative seeds anyway
+    seed = int(text)
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"seed must be between 0 and {MAX_SEED}")
+    return seed
+
+
+def held_from_mask(mask):
+    return frozenset(key for bit, key in enumerate(MOVEMENT_KEYS) if mask & (1 << bit))
+
+
+class LiveInput:
+    # Everything the simulation reads from outside itself: held keys, when loading finished and the save on disk
+    def held_keys(self, step):
+        keys = pygame.key.get_pressed()
+        return frozenset(key for key in MOVEMENT_KEYS if keys[key])
+
+    def loading_done(self, startup, step):
+        return startup is None or startup.done.is_set()
+
+    def load_save(self, save_manager):
+        return save_manager.load() if save_manager else None
+
+    def note_event(self, step, event):
+        pass
+
+    def close(self, step, checksum):
+        pass
+
+
+class InputRecorder(LiveInput):
+    # Logs the live input as it's read, appended to the file as it goes so a crash still leaves a usable recording
+    def __init__(self, path, seed, continue_available):
+        self.file = open(path, "wb")
+        self.file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, seed, continue_available))
+        self.held = frozenset()
+        self.loading_logged = False
+
+    def write(self, step, kind, value=0):
+        self.file.write(RECORD.pack(step, kind, value))
+
+    def held_keys(self, step):
+        held = super().held_keys(step)
+        if held != self.held:
+            self.held = held
+            self.write(step, HELD_KEYS, sum(1 << bit for bit, key in enumerate(MOVEMENT_KEYS) if key in held))
+        return held
+
+    def loading_done(self, startup, step):
+        done = super().loading_done(startup, step)
+        if done and not self.loading_logged:
+            self.loading_logged = True
+            self.write(step, LOADING_DONE)
+        return done
+
+    def load_save(self, save_manager):
+        saved = super().load_save(save_manager)
+        if saved:
+            # The save is part of the session, the one on disk will have moved on by the time anyone replays it
+            meta, rows = saved
+            data = encode_save(FULL_SAVE, 0, meta, None, rows)
+            self.write(0, LOADED_SAVE, len(data))
+            self.file.write(data)
+        return saved
+
+    def note_event(self, step, event):
+        if event.type == pygame.KEYDOWN:
+            self.write(step, KEY_DOWN, event.key)
+        elif event.type == pygame.KEYUP:
+            self.write(step, KEY_UP, event.key)
+
+    def close(self, step, checksum):
+        self.write(step, END, checksum)
+        self.file.close()
+
+
+class Recording:
+    def __init__(self, seed, continue_available, records, saves, end_step, checksum):
+        self.seed = seed
+        self.continue_available = continue_available
+        self.records = records  # [(step, kind, value)] in the order they happened
+        self.saves = saves  # Encoded saves loaded by Continue, in order
+        self.end_step = end_step  # None if the recording was cut off
+        self.checksum = checksum
+
+
+def read_recording(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, seed, continue_available = RECORDING_HEADER.unpack_from(data)
+    if magic != RECORDING_MAGIC:
+        raise ValueError("not an input recording")
+    if version != RECORDING_VERSION:
+        raise ValueError(f"recording version {version}, expected {RECORDING_VERSION}")
+    records = []
+    saves = []
+    end_step = checksum = None
+    offset = RECORDING_HEADER.size
+    while offset + RECORD.size <= len(data):  # A crash can leave half a record at the end
+        step, kind, value = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if kind == LOADED_SAVE:
+            saves.append(data[offset:offset + value])
+            offset += value
+        elif kind == END:
+            end_step, checksum = step, value
+        else:
+            records.append((step, kind, value))
+    return Recording(seed, bool(continue_available), records, saves, end_step, checksum)
+
+
+class InputReplayer:
+    # Stands in for LiveInput, answering from a recording. The runner calls events_before() ahead of each step
+    def __init__(self, recording):
+        self.recording = recording
+        self.next_record = 0
+        self.held = frozenset()
+        self.loading_step = None
+        self.saves = list(recording.saves)
+
+    def events_before(self, step):
+        # Key events that reached the game before this step, as pygame events
+        events = []
+        records = self.recording.records
+        while self.next_record < len(records) and records[self.next_record][0] <= step:
+            _, kind, value = records[self.next_record]
+            self.next_record += 1
+            if kind == KEY_DOWN:
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=value))
+            elif kind == KEY_UP:
+                events.append(pygame.event.Event(pygame.KEYUP, key=value))
+            elif kind == HELD_KEYS:
+                self.held = held_from_mask(value)
+            elif kind == LOADING_DONE:
+                self.loading_step = step
+        return events
+
+    def held_keys(self, step):
+        return self.held
+
+    def loading_done(self, startup, step):
+        # Loading finishes on the same step it did live, however long it takes this time
+        if self.loading_step is None or step < self.loading_step:
+            return False
+        if startup is not None:
+            startup.done.wait()
+        return True
+
+    def load_save(self, save_manager):
+        if not self.saves:
+            return None
+        _, _, meta, _, rows = decode_save(self.saves.pop(0))
+        return meta, rows
+
+    def note_event(self, step, event):
+        pass
+
+    def close(self, step, checksum):
+        pass
@@ -0,0 +1,100 @@
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+MAX_BUFFERED_MOVES = 4  # Move presses waiting on the move delay, any past this are mashing and get dropped
+LATENCY_WINDOW = 1000  # Input-to-display samples kept for the percentiles
+MOVE_KEYS = {
+    pygame.K_LEFT: (-1, 0), pygame.K_a: (-1, 0),
+    pygame.K_RIGHT: (1, 0), pygame.K_d: (1, 0),
+    pygame.K_UP: (0, -1), pygame.K_w: (0, -1),
+    pygame.K_DOWN: (0, 1), pygame.K_s: (0, 1),
+}
+INTERACT_KEY = pygame.K_SPACE
+# Buffered action kinds
+MOVE = 0
+INTERACT = 1
+
+
+def held_direction(held):
+    # One step from whatever movement keys are down, opposite keys cancel out
+    dx = dy = 0
+    for key in held:
+        direction = MOVE_KEYS.get(key)
+        if direction:
+            dx += direction[0]
+            dy += direction[1]
+    return max(-1, min(1, dx)), max(-1, min(1, dy))
+
+
+class InputQueue:
+    # The one place pygame events are pulled from. Events are timestamped as they're pumped and handed to the game
+    # in order; exploration presses are buffered as actions until a fixed step runs them, so a tap shorter than the
+    # move delay still moves. Latency is measured from the pump to the frame that first shows the result
+    def __init__(self, scheduler, profiler):
+        self.scheduler = scheduler
+        self.profiler = profiler
+        self.events = deque()  # (timestamp, event) pumped but not yet dispatched
+        self.actions = deque()  # (timestamp, kind, dx, dy) waiting for the simulation
+        self.quit_requested = False
+        self.undisplayed = []  # Timestamps of inputs that changed the screen since the last frame went out
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def pump(self, wait=False):
+        # Pulls everything pygame has queued. With wait and nothing queued, sleeps until input arrives (or the
+        # scheduler's idle timeout passes). Returns True if it slept
+        events = pygame.event.get()
+        waited = False
+        if not events and wait:
+            events = self.scheduler.wait_for_events()
+            waited = True
+        now = time.perf_counter()
+        self.events.extend((now, event) for event in events)
+        return waited
+
+    def dispatch(self, handler):
+        # Calls handler(event, timestamp) for each pumped event, in the order they arrived
+        while self.events:
+            timestamp, event = self.events.popleft()
+            if event.type == pygame.QUIT:
+                self.quit_requested = True
+            else:
+                handler(event, timestamp)
+
+    def buffer_key(self, key, timestamp):
+        # An exploration key press, kept until the simulation can act on it. Returns False if it isn't one
+        if key == INTERACT_KEY:
+            # Always kept, however many moves are queued ahead of it
+            self.actions.append((timestamp, INTERACT, 0, 0))
+        elif key in MOVE_KEYS:
+            if sum(kind == MOVE for _, kind, _, _ in self.actions) < MAX_BUFFERED_MOVES:
+                self.actions.append((timestamp, MOVE) + MOVE_KEYS[key])
+        else:
+            return False
+        return True
+
+    def clear_actions(self):
+        self.actions.clear()
+
+    def changed_screen(self, timestamp):
+        # The input pumped at timestamp changed what's on screen, the next presented frame shows it
+        self.undisplayed.append(timestamp)
+
+    def frame_presented(self):
+        if not self.undisplayed:
+            return
+        now = time.perf_counter()
+        for timestamp in self.undisplayed:
+            milliseconds = (now - timestamp) * 1000
+            self.latencies.append(milliseconds)
+            if self.profiler.enabled:
+                self.profiler.record("input_latency", milliseconds)
+        self.undisplayed = []
+
+    def latency_summary(self):
+        if not self.latencies:
+            return "no inputs shown"
+        p50, p95, p99 = np.percentile(np.fromiter(self.latencies, dtype=np.float64), [50, 95, 99])
+        return f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms over {len(self.latencies)} inputs"
@@ -1,6 +1,17 @@
+import argparse
+
 import pygame
 from engine import Game
-from npcs import NPCManager
+from input_log import InputRecorder, parse_seed
+
+parser = argparse.ArgumentParser(description="Play the game")
+parser.add_argument("--record", metavar="PATH", help="Record the session's input, play it back with replay.py")
+parser.add_argument("--seed", type=parse_seed, default=None, help="Seed for the simulation RNG")
+parser.add_argument("--profile", action="store_true", help="Start with the profiler HUD up (F3 toggles it)")
+parser.add_argument("--trace", metavar="PATH", help="Write a Chrome trace of the whole session (F4 captures part of one)")
+parser.add_argument("--world", metavar="PATH", default="data/maps.json",
+                    help="Maps to play, a maps.json or a binary world from world_format.py")
+args = parser.parse_args()
 
 # Initialize Pygame
 pygame.init()
@@ -11,27 +22,56 @@ SCREEN_HEIGHT = 600
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption('Stupid Little Feeble Attempt at an RPG')
 
-# Create the game object
-game = Game(screen)
+# Create the game object, it autosaves into saves/ and the menu's Continue loads from there
+game = Game(screen, seed=args.seed, save_dir="saves")
+if args.record:
+    game.input = InputRecorder(args.record, game.seed, game.menu_engine.continue_available)
+game.start_loading(maps_path=args.world)  # Data loads in the background while the menu is up
+if args.profile:
+    game.profiler.hud_visible = True
+if args.trace:
+    game.profiler.start_trace()
+if args.profile or args.trace:
+    game.profiler.enable()
 
-# Initialize NPC Manager to keep track of NPC states
-npc_manager = NPCManager()
+# Most fixed steps to catch up on in one frame, so a long stall doesn't snowball.
+# Covers the scheduler's idle sleep so sleeping doesn't slow the world down.
+MAX_STEPS_PER_FRAME = 30
 
 # Main game loop
 running = True
 clock = pygame.time.Clock()
+accumulator = 0.0
+input_queue = game.input_queue
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-    
-    # Update game state
-    game.update()
+    # The frame cap sleeps before input is read rather than after, so what gets simulated and drawn is fresh
+    accumulator += clock.tick(60) / 1000
+    if input_queue.pump(wait=game.is_idle()):
+        accumulator += clock.tick() / 1000  # Slept until input arrived, the world still moved on meanwhile
+    input_queue.dispatch(game.handle_event)
+    running = not input_queue.quit_requested
 
-    # Render the game
-    game.render()
+    # Run the simulation in fixed steps, however long the frame took
+    game.profiler.begin_frame()  # Frames are timed from here, after the sleeps above
+    steps = 0
+    while accumulator >= game.step_dt and steps < MAX_STEPS_PER_FRAME:
+        game.update()
+        accumulator -= game.step_dt
+        steps += 1
+    if steps == MAX_STEPS_PER_FRAME:
+        accumulator = 0.0
 
-    # Cap the frame rate
-    clock.tick(60)
+    # Render the game, only when something changed
+    if game.scheduler.dirty:
+        game.render()
+        game.scheduler.frame_drawn()
+    if game.profiler.end_frame():
+        game.scheduler.mark_dirty()  # The HUD has new numbers to show
 
+print(f"[Input] Input to display: {input_queue.latency_summary()}")
+# Save on the way out and wait for the writer thread to finish
+game.input.close(game.steps, game.state_checksum())
+if args.trace and game.profiler.trace_events is not None:
+    game.profiler.stop_trace(args.trace)
+game.save_game(wait=True)
 pygame.quit()
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+
+import pygame
+
+TILE_SIZE = 32
+CHUNK_TILES = 16  # Chunks are 16x16 tiles (512x512 pixels)
+PREBAKE_LIMIT = 16  # Maps with at most this many chunks are baked whole on load
+MAX_CACHED_CHUNKS = 64  # Baked chunks kept across all maps, least recently drawn go first
+
+class MapRenderer:
+    def __init__(self, screen, tile_atlas, tile_rects, tile_size=TILE_SIZE, chunk_tiles=CHUNK_TILES,
+                 max_cached_chunks=MAX_CACHED_CHUNKS):
+        self.screen = screen
+        self.tile_atlas = tile_atlas  # Every tile image packed into one surface
+        self.tile_rects = tile_rects  # Area of the atlas per tile ID (None for tiles that aren't drawn)
+        self.tile_size = tile_size
+        self.chunk_tiles = chunk_tiles
+        self.max_cached_chunks = max_cached_chunks
+        self.chunk_cache = OrderedDict()  # (map name, chunk_x, chunk_y) -> Surface
+        self.map_name = None
+        self.tile_map = None
+
+    def load_map(self, map_name, tile_map):
+        self.map_name = map_name
+        self.tile_map = tile_map
+
+        # Small maps are prebaked now, big ones get their chunks baked as they come into view
+        chunks_x = -(-tile_map.width // self.chunk_tiles)
+        chunks_y = -(-tile_map.height // self.chunk_tiles)
+        if chunks_x * chunks_y <= PREBAKE_LIMIT:
+            for chunk_y in range(chunks_y):
+                for chunk_x in range(chunks_x):
+                    self.get_chunk(chunk_x, chunk_y)
+
+    def invalidate(self, map_name=None):
+        # Drop baked chunks so they get rebuilt the next time they're drawn
+        if map_name is None:
+            self.chunk_cache.clear()
+        else:
+            for key in [key for key in self.chunk_cache if key[0] == map_name]:
+                del self.chunk_cache[key]
+
+    def get_chunk(self, chunk_x, chunk_y):
+        key = (self.map_name, chunk_x, chunk_y)
+        surface = self.chunk_cache.get(key)
+        if surface is None:
+            surface = self.bake_chunk(self.tile_map, chunk_x, chunk_y)
+            self.chunk_cache[key] = surface
+            if len(self.chunk_cache) > self.max_cached_chunks:
+                self.chunk_cache.popitem(last=False)
+        else:
+            self.chunk_cache.move_to_end(key)
+        return surface
+
+    def bake_chunk(self, tile_map, chunk_x, chunk_y):
+        start_x = chunk_x * self.chunk_tiles
+        start_y = chunk_y * self.chunk_tiles
+        tiles_x = min(self.chunk_tiles, tile_map.width - start_x)
+        tiles_y = min(self.chunk_tiles, tile_map.height - start_y)
+        surface = pygame.Surface((tiles_x * self.tile_size, tiles_y * self.tile_size))
+        surface.fill((0, 0, 0))
+
+        # One blits() call for the whole chunk, every tile is an area of the same atlas
+        atlas = self.tile_atlas
+        tile_rects = self.tile_rects
+        size = self.tile_size
+        blits = []
+        for y in range(tiles_y):
+            row = tile_map.get_row(start_y + y, start_x, start_x + tiles_x)
+            for x, tile_id in enumerate(row):
+                area = tile_rects[tile_id]
+                if area is not None:
+                    blits.append((atlas, (x * size, y * size), area))
+        surface.blits(blits, doreturn=False)
+
+        # Match the display format so per-frame blits are plain copies
+        return surface.convert()
+
+    def draw(self, camera_offset, area=None):
+        # Draws the whole viewport, or just the screen rect area of it. Returns how many chunks it blitted
+        if self.tile_map is None:
+            return 0
+
+        chunk_px = self.chunk_tiles * self.tile_size
+        camera_px = camera_offset[0] * self.tile_size
+        camera_py = camera_offset[1] * self.tile_size
+        area = self.screen.get_rect() if area is None else self.screen.get_rect().clip(area)
+        if not area:
+            return 0
+
+        # Only visit the chunks that overlap the area, and only copy the part of each that's inside it
+        first_x = max(0, (camera_px + area.left) // chunk_px)
+        first_y = max(0, (camera_py + area.top) // chunk_px)
+        last_x = min((camera_px + area.right - 1) // chunk_px, (self.tile_map.width - 1) // self.chunk_tiles)
+        last_y = min((camera_py + area.bottom - 1) // chunk_px, (self.tile_map.height - 1) // self.chunk_tiles)
+
+        blits = 0
+        for chunk_y in range(first_y, last_y + 1):
+            for chunk_x in range(first_x, last_x + 1):
+                surface = self.get_chunk(chunk_x, chunk_y)
+                chunk_rect = pygame.Rect(chunk_x * chunk_px - camera_px, chunk_y * chunk_px - camera_py,
+                                         surface.get_width(), surface.get_height())
+                visible = chunk_rect.clip(area)
+                if visible:
+                    self.screen.blit(surface, visible.topleft, visible.move(-chunk_rect.x, -chunk_rect.y))
+                    blits += 1
+        return blits
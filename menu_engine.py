@@ -1,64 +1,95 @@
 import pygame
 
+BACKGROUND = (50, 50, 50)
+
 class MenuEngine:
-    def __init__(self, screen):
+    def __init__(self, screen, text_renderer, scheduler):
         self.screen = screen
-        self.font = pygame.font.Font(None, 48)
+        self.text_renderer = text_renderer
+        self.scheduler = scheduler
+        self.font = text_renderer.get_font(48)
         self.options = ["New Game", "Continue", "Exit"]
         self.selected_option = 0
+        self.continue_available = False  # Set by the game when there's a save to continue from
+        self.loading_status = None  # Startup progress line shown under the options while data loads
+        self.status_font = text_renderer.get_font(24)
+        self.exit_requested = False
+        self.drawn = {}  # Widget key -> (surface, rect) as last drawn
+        self.widget_keys = set()
 
-    def start_menu(self):
-        self.menu_loop()
-
-    def menu_loop(self):
-        running = True
-        while running:
-            self.render()
-            running = self.handle_input()
-
-    def handle_input(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP:
-                    self.selected_option = (self.selected_option - 1) % len(self.options)
-                elif event.key == pygame.K_DOWN:
-                    self.selected_option = (self.selected_option + 1) % len(self.options)
-                elif event.key == pygame.K_RETURN:
-                    return self.select_option()
+    def handle_event(self, event):
+        # Fed by the game's input queue. Returns False once the menu is done and the game should start
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_UP:
+                self.selected_option = (self.selected_option - 1) % len(self.options)
+                self.scheduler.mark_dirty()
+            elif event.key == pygame.K_DOWN:
+                self.selected_option = (self.selected_option + 1) % len(self.options)
+                self.scheduler.mark_dirty()
+            elif event.key == pygame.K_RETURN:
+                return self.select_option()
 
         return True
 
     def select_option(self):
         if self.selected_option == 0:  # New Game
             return False  # Exiting the menu loop to start the game
-        elif self.selected_option == 1:  # Continue (greyed out)
-            pass  # No action, as continue is not implemented
+        elif self.selected_option == 1:  # Continue (greyed out without a save)
+            if self.continue_available:
+                return False  # The game loads the save once the menu is done
         elif self.selected_option == 2:  # Exit
-            pygame.quit()
-            exit()
+            self.exit_requested = True  # The game ends its main loop, which saves and closes any recording
 
         return True
 
-    def render(self):
-        self.screen.fill((50, 50, 50))
+    def render(self, full=True):
+        # Draws the options and the status line. Unless full, only the ones that look different are redrawn
+        if full:
+            self.screen.fill(BACKGROUND)
+            self.drawn = {}
 
+        rects = []
+        for key, surface, position in self.widgets():
+            drawn = self.drawn.get(key)
+            if drawn is not None and drawn[0] is surface and drawn[1].topleft == position:
+                continue  # Rendered text is cached, the same surface means it looks the same
+            rect = surface.get_rect(topleft=position)
+            if drawn is not None:
+                self.screen.fill(BACKGROUND, drawn[1])
+                rects.append(drawn[1])
+            self.screen.blit(surface, rect)
+            rects.append(rect)
+            self.drawn[key] = (surface, rect)
+        for key in [key for key in self.drawn if key not in self.widget_keys]:
+            # The status line went away once loading finished
+            rect = self.drawn.pop(key)[1]
+            self.screen.fill(BACKGROUND, rect)
+            rects.append(rect)
+
+        if full:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+
+    def widgets(self):
+        # (key, surface, top left) for each piece of text on the menu
+        widgets = []
         for i, option in enumerate(self.options):
             if i == self.selected_option:
                 color = (255, 255, 255)
             else:
                 color = (150, 150, 150)
 
-            if option == "Continue":
+            if option == "Continue" and not self.continue_available:
                 color = (100, 100, 100)  # Greyed out
 
-            text_surface = self.font.render(option, True, color)
+            text_surface = self.text_renderer.render(option, self.font, color)
             x = self.screen.get_width() // 2 - text_surface.get_width() // 2
             y = self.screen.get_height() // 2 + i * 60
-            self.screen.blit(text_surface, (x, y))
-
-        pygame.display.flip()
+            widgets.append((i, text_surface, (x, y)))
 
-    def end_menu(self):
-        pass  # Exit menu and return to game
+        if self.loading_status:
+            status_surface = self.text_renderer.render(self.loading_status, self.status_font, (150, 150, 150))
+            widgets.append(("status", status_surface, (10, self.screen.get_height() - status_surface.get_height() - 10)))
+        self.widget_keys = {key for key, _, _ in widgets}
+        return widgets
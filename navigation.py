@@ -0,0 +1,379 @@
+import heapq
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from tile_map import WALKABLE
+
+WALKABLE_LOOKUP = np.frombuffer(WALKABLE, dtype=np.uint8).astype(bool)
+UNREACHABLE = -1
+HOME_MARGIN = 4  # Extra tiles around an NPC's wander range that its way-home field covers, for walking round walls
+MAX_HOME_FIELDS = 16384  # Way-home fields kept (a few KB each), least recently used go first
+MAX_FIELDS = 8  # Whole-map distance fields kept (they're width * height ints each)
+MAX_CHUNK_MASKS = 4096  # Walkability of chunked-map chunks kept (chunk_size squared bools each), least recently used go first
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+NEIGHBOUR_X = np.array([dx for dx, _ in NEIGHBOURS])
+NEIGHBOUR_Y = np.array([dy for _, dy in NEIGHBOURS])
+
+
+def walkable_mask(tile_map):
+    # Flat bool array indexed by y * width + x
+    tiles = getattr(tile_map, "tiles", None)
+    if tiles is None:
+        # Chunked maps don't keep the grid in memory, read it row by row. That's the whole file, so only whole-map
+        # queries (A*, distance_field) come here
+        tiles = b"".join(tile_map.get_row(y, 0, tile_map.width) for y in range(tile_map.height))
+    return WALKABLE_LOOKUP[np.frombuffer(tiles, dtype=np.uint8)]
+
+
+def bfs_distances(walkable, width, sources, plane_size=None):
+    # Steps from the nearest source to every cell of a flat grid, one numpy pass per ring.
+    # With plane_size, walkable is a stack of equal grids searched all at once, nothing crosses between them
+    plane_size = plane_size or walkable.size
+    distances = np.full(walkable.size, UNREACHABLE, dtype=np.int32)
+    slots = np.empty(walkable.size, dtype=np.int64)  # Scratch space for dropping repeated cells without a sort
+    frontier = np.asarray(sources, dtype=np.int64)
+    frontier = np.unique(frontier[walkable[frontier]])
+    distances[frontier] = 0
+    distance = 0
+    while frontier.size:
+        distance += 1
+        x = frontier % width
+        in_plane = frontier % plane_size
+        candidates = np.concatenate((frontier[x > 0] - 1, frontier[x < width - 1] + 1,
+                                     frontier[in_plane >= width] - width,
+                                     frontier[in_plane < plane_size - width] + width))
+        candidates = candidates[walkable[candidates] & (distances[candidates] == UNREACHABLE)]
+        # A cell reached from two sides shows up twice, keep only the occurrence that wins the scatter
+        order = np.arange(candidates.size)
+        slots[candidates] = order
+        frontier = candidates[slots[candidates] == order]
+        distances[frontier] = distance
+    return distances
+
+
+def label_regions(walkable, width, height):
+    # Connected walkable areas, labelled 0.. (UNREACHABLE for walls). Unions runs of floor per row, not single cells
+    grid = np.zeros((height, width + 2), dtype=np.int8)
+    grid[:, 1:-1] = walkable.reshape(height, width)
+    edges = np.diff(grid, axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    run_ends = np.nonzero(edges == -1)[1]  # Exclusive, runs come out in the same row-major order
+    row_first = np.searchsorted(run_rows, np.arange(height + 1)).tolist()
+    starts = run_starts.tolist()
+    ends = run_ends.tolist()
+
+    parent = list(range(len(starts)))
+
+    def find(run):
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    for y in range(1, height):
+        above, above_end = row_first[y - 1], row_first[y]
+        below, below_end = row_first[y], row_first[y + 1]
+        # Both rows' runs are sorted, walk them together and join the ones that overlap
+        while above < above_end and below < below_end:
+            if starts[above] < ends[below] and starts[below] < ends[above]:
+                root_above, root_below = find(above), find(below)
+                if root_above != root_below:
+                    parent[root_below] = root_above
+            if ends[above] < ends[below]:
+                above += 1
+            else:
+                below += 1
+
+    roots = np.array([find(run) for run in range(len(starts))], dtype=np.int64)
+    _, run_labels = np.unique(roots, return_inverse=True)
+    labels = np.full(walkable.size, UNREACHABLE, dtype=np.int32)
+    # Walkable cells in row-major order are exactly the runs laid end to end
+    labels[walkable] = np.repeat(run_labels.astype(np.int32), run_ends - run_starts)
+    return labels
+
+
+def window_distances(distances, rows, size, x, y):
+    # Distance at (x, y) in row rows[i] of a stack of size x size windows, UNREACHABLE outside the window
+    inside = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+    return np.where(inside, distances[rows, np.where(inside, y * size + x, 0)], UNREACHABLE)
+
+
+class DistanceField:
+    # BFS distances to a target over a window of a map, walking downhill leads to the target
+    __slots__ = ("left", "top", "width", "height", "distances")
+
+    def __init__(self, left, top, width, height, distances):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.distances = distances
+
+    def distance(self, x, y):
+        x -= self.left
+        y -= self.top
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return int(self.distances[y * self.width + x])
+        return UNREACHABLE
+
+    def next_step(self, x, y):
+        # Neighbouring cell one step closer to the target, or None when already there or it can't be reached
+        distance = self.distance(x, y)
+        if distance <= 0:
+            return None
+        for dx, dy in NEIGHBOURS:
+            if self.distance(x + dx, y + dy) == distance - 1:
+                return x + dx, y + dy
+        return None
+
+
+class Navigation:
+    # Walkability, connected regions and cached distance fields per map, all built on first use
+    def __init__(self, maps):
+        self.maps = maps
+        self.walkable = {}  # map name -> flat bool mask
+        self.walkable_bytes = {}  # map name -> the same mask as bytes, much quicker to index one cell at a time
+        self.regions = {}  # map name -> flat region labels
+        self.chunk_masks = OrderedDict()  # (map name, chunk number) -> flat bool mask of one chunk of a chunked map
+        self.home_fields = OrderedDict()  # (map name, x, y, radius) -> row in home_distances[radius]
+        self.home_distances = {}  # radius -> way-home fields stacked one per row, (radius + HOME_MARGIN) * 2 + 1 square
+        self.free_home_rows = {}  # radius -> rows of home_distances[radius] not in use
+        self.fields = OrderedDict()  # (map name, targets) -> DistanceField over the whole map
+
+    def invalidate(self, map_name):
+        # Call after a map's tiles change, everything derived from them is rebuilt on next use
+        self.walkable.pop(map_name, None)
+        self.walkable_bytes.pop(map_name, None)
+        self.regions.pop(map_name, None)
+        for key in [key for key in self.home_fields if key[0] == map_name]:
+            self.free_home_rows[key[3]].append(self.home_fields.pop(key))
+        for cache in (self.chunk_masks, self.fields):
+            for key in [key for key in cache if key[0] == map_name]:
+                del cache[key]
+
+    def walkable_mask(self, map_name):
+        mask = self.walkable.get(map_name)
+        if mask is None:
+            mask = walkable_mask(self.maps[map_name])
+            self.walkable[map_name] = mask
+        return mask
+
+    def walkable_at(self, map_name, xs, ys):
+        # Walkability of any number of cells at once, False off the map. Chunked maps are read a chunk at a time,
+        # so NPCs and their way-home windows only ever touch the chunks they're in
+        tile_map = self.maps[map_name]
+        inside = (xs >= 0) & (xs < tile_map.width) & (ys >= 0) & (ys < tile_map.height)
+        xs = np.where(inside, xs, 0)
+        ys = np.where(inside, ys, 0)
+        if getattr(tile_map, "tiles", None) is not None:
+            return inside & self.walkable_mask(map_name)[ys * tile_map.width + xs]
+
+        if not inside.size:
+            return inside
+        chunk_size = tile_map.chunk_size
+        chunks = (ys // chunk_size) * tile_map.chunks_x + xs // chunk_size
+        numbers, which = np.unique(chunks, return_inverse=True)
+        masks = np.stack([self.chunk_mask(map_name, number) for number in numbers.tolist()])
+        return inside & masks[which.reshape(chunks.shape), (ys % chunk_size) * chunk_size + xs % chunk_size]
+
+    def chunk_mask(self, map_name, number):
+        key = (map_name, number)
+        mask = self.chunk_masks.get(key)
+        if mask is not None:
+            self.chunk_masks.move_to_end(key)
+            return mask
+        tile_map = self.maps[map_name]
+        mask = WALKABLE_LOOKUP[np.frombuffer(tile_map.chunk(number % tile_map.chunks_x, number // tile_map.chunks_x),
+                                             dtype=np.uint8)]
+        self.chunk_masks[key] = mask
+        if len(self.chunk_masks) > MAX_CHUNK_MASKS:
+            self.chunk_masks.popitem(last=False)
+        return mask
+
+    def region_labels(self, map_name):
+        # Labels the whole map, only A* asks for this
+        labels = self.regions.get(map_name)
+        if labels is None:
+            tile_map = self.maps[map_name]
+            labels = label_regions(self.walkable_mask(map_name), tile_map.width, tile_map.height)
+            self.regions[map_name] = labels
+        return labels
+
+    def connected(self, map_name, start, goal):
+        tile_map = self.maps[map_name]
+        if not (tile_map.in_bounds(*start) and tile_map.in_bounds(*goal)):
+            return False
+        labels = self.region_labels(map_name)
+        start_label = labels[start[1] * tile_map.width + start[0]]
+        return start_label != UNREACHABLE and start_label == labels[goal[1] * tile_map.width + goal[0]]
+
+    def steps_home(self, map_name, pos_x, pos_y, home_x, home_y, radii):
+        # One step downhill on each NPC's way-home field, as (new x, new y, stepping). Stepping is False for NPCs
+        # already home or cut off from it, they stay put
+        new_x = pos_x.copy()
+        new_y = pos_y.copy()
+        stepping = np.zeros(len(pos_x), dtype=bool)
+        for radius in np.unique(radii).tolist():
+            group = np.flatnonzero(radii == radius)
+            rows = self.home_rows(map_name, home_x[group], home_y[group], radius)
+            reach = radius + HOME_MARGIN
+            size = reach * 2 + 1
+            distances = self.home_distances[radius]
+            x = (pos_x[group] - home_x[group] + reach)[:, None]
+            y = (pos_y[group] - home_y[group] + reach)[:, None]
+            rows = rows[:, None]
+            here = window_distances(distances, rows, size, x, y)
+            around = window_distances(distances, rows, size, x + NEIGHBOUR_X, y + NEIGHBOUR_Y)
+            # The first neighbour one step closer, in NEIGHBOURS order
+            downhill = (around == here - 1) & (here > 0)
+            moving = downhill.any(axis=1)
+            choice = downhill.argmax(axis=1)[moving]
+            new_x[group[moving]] += NEIGHBOUR_X[choice]
+            new_y[group[moving]] += NEIGHBOUR_Y[choice]
+            stepping[group] = moving
+        self.trim_home_fields()
+        return new_x, new_y, stepping
+
+    def home_rows(self, map_name, home_x, home_y, radius):
+        # Row of home_distances[radius] holding each home's field, the missing ones built in one batch
+        keys = [(map_name, x, y, radius) for x, y in zip(home_x.tolist(), home_y.tolist())]
+        rows = [self.home_fields.get(key) for key in keys]
+        missing = []
+        for key, row in zip(keys, rows):
+            if row is None:
+                missing.append(key)
+            else:
+                self.home_fields.move_to_end(key)
+        if missing:
+            missing = list(dict.fromkeys(missing))
+            reach = radius + HOME_MARGIN
+            built = self.build_home_fields(map_name, [key[1:3] for key in missing], reach, reach * 2 + 1)
+            free = self.free_home_rows.setdefault(radius, [])
+            if len(free) < len(missing):
+                self.grow_home_distances(radius, built.shape[1], len(missing) - len(free))
+            new_rows = [free.pop() for _ in missing]
+            self.home_distances[radius][new_rows] = built
+            self.home_fields.update(zip(missing, new_rows))
+            rows = [self.home_fields[key] for key in keys]
+        return np.array(rows, dtype=np.int64)
+
+    def grow_home_distances(self, radius, plane_size, needed):
+        old = self.home_distances.get(radius, np.zeros((0, plane_size), dtype=np.int16))
+        capacity = max(16, len(old) * 2, len(old) + needed)
+        grown = np.empty((capacity, plane_size), dtype=np.int16)
+        grown[:len(old)] = old
+        self.home_distances[radius] = grown
+        self.free_home_rows[radius].extend(range(capacity - 1, len(old) - 1, -1))
+
+    def trim_home_fields(self):
+        # Least recently used fields past the limit hand their rows back
+        while len(self.home_fields) > MAX_HOME_FIELDS:
+            key, row = self.home_fields.popitem(last=False)
+            self.free_home_rows[key[3]].append(row)
+
+    def build_home_fields(self, map_name, homes, reach, size):
+        # Reads a size x size window round every home (off the map counts as wall) and runs one BFS over the stack.
+        # Returns the distances one home per row
+        home_x = np.array([x for x, _ in homes], dtype=np.int64)
+        home_y = np.array([y for _, y in homes], dtype=np.int64)
+        offsets = np.arange(size) - reach
+        windows = self.walkable_at(map_name, (home_x[:, None] + offsets)[:, None, :],
+                                   (home_y[:, None] + offsets)[:, :, None])
+
+        plane_size = size * size
+        sources = np.arange(len(homes)) * plane_size + reach * size + reach  # Each window's centre
+        distances = bfs_distances(windows.ravel(), size, sources, plane_size)
+        return distances.astype(np.int16).reshape(len(homes), plane_size)
+
+    def home_field(self, map_name, home, radius):
+        # One NPC's way-home field on its own, for callers outside the batched step
+        row = self.home_rows(map_name, np.array([home[0]]), np.array([home[1]]), radius)[0]
+        reach = radius + HOME_MARGIN
+        size = reach * 2 + 1
+        field = DistanceField(home[0] - reach, home[1] - reach, size, size, self.home_distances[radius][row].copy())
+        self.trim_home_fields()
+        return field
+
+    def distance_field(self, map_name, targets):
+        # Distances to the nearest of several targets (a map's doors, say) over the whole map
+        key = (map_name, tuple(sorted((x, y) for x, y in targets)))
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            return field
+
+        tile_map = self.maps[map_name]
+        sources = [y * tile_map.width + x for x, y in key[1] if tile_map.in_bounds(x, y)]
+        distances = bfs_distances(self.walkable_mask(map_name), tile_map.width, sources)
+        field = DistanceField(0, 0, tile_map.width, tile_map.height, distances)
+        self.fields[key] = field
+        if len(self.fields) > MAX_FIELDS:
+            self.fields.popitem(last=False)
+        return field
+
+    def find_path(self, map_name, start, goal):
+        # A* for one-off queries, returns the cells after start up to goal, or None if there's no way through
+        if not self.connected(map_name, start, goal):
+            return None
+        tile_map = self.maps[map_name]
+        width, height = tile_map.width, tile_map.height
+        walkable = self.walkable_bytes.get(map_name)
+        if walkable is None:
+            walkable = self.walkable_mask(map_name).tobytes()
+            self.walkable_bytes[map_name] = walkable
+        goal_x, goal_y = goal
+        start_cell = start[1] * width + start[0]
+        goal_cell = goal_y * width + goal_x
+
+        came_from = {start_cell: None}
+        cost = {start_cell: 0}
+        # Ties on estimated length go to the cell furthest along, which saves expanding whole open areas
+        heap = [(abs(start[0] - goal_x) + abs(start[1] - goal_y), 0, start_cell)]
+        while heap:
+            _, negative_steps, cell = heapq.heappop(heap)
+            steps = -negative_steps
+            if cell == goal_cell:
+                break
+            if steps > cost[cell]:
+                continue  # Stale entry, a shorter way here was found since
+            x, y = cell % width, cell // width
+            for dx, dy in NEIGHBOURS:
+                next_x, next_y = x + dx, y + dy
+                if not (0 <= next_x < width and 0 <= next_y < height):
+                    continue
+                next_cell = next_y * width + next_x
+                if not walkable[next_cell] or cost.get(next_cell, steps + 2) <= steps + 1:
+                    continue
+                cost[next_cell] = steps + 1
+                came_from[next_cell] = cell
+                heapq.heappush(heap, (steps + 1 + abs(next_x - goal_x) + abs(next_y - goal_y), -(steps + 1), next_cell))
+
+        if goal_cell not in came_from:
+            return None
+        path = []
+        cell = goal_cell
+        while cell != start_cell:
+            path.append((cell % width, cell // width))
+            cell = came_from[cell]
+        path.reverse()
+        return path
+
+
+def nearest_walkable(tile_map, start_pos):
+    # Breadth-first search outwards from start_pos, cells are marked seen as they're queued so none is queued twice
+    x, y = start_pos
+    if tile_map.is_walkable(x, y):
+        return [x, y]
+    queue = deque([(x, y)])
+    seen = {(x, y)}
+    while queue:
+        x, y = queue.popleft()
+        if tile_map.is_walkable(x, y):
+            return [x, y]
+        for dx, dy in NEIGHBOURS:
+            cell = (x + dx, y + dy)
+            if cell not in seen and tile_map.in_bounds(*cell):
+                seen.add(cell)
+                queue.append(cell)
+    return start_pos
@@ -0,0 +1,481 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+from timers import BatchTimerQueue
+
+DIRECTIONS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.int32)
+MOVES_BEFORE_RETURNING = 3
+SETTLE_AFTER = 12.0  # Seconds a map can fall behind and still be replayed, past a few move intervals it's settled instead
+SETTLE_TRIES = 4  # Random spots tried per NPC when settling, the ones that find nowhere free stay where they are
+# Fields that change while playing, saved as one record per NPC (start positions and names come from the data files)
+SAVED_FIELDS = (("pos_x", "<i4"), ("pos_y", "<i4"), ("map_index", "<i4"), ("move_count", "<i4"),
+                ("return_to_start", "?"), ("seduction_level", "<i4"), ("last_move_time", "<f8"),
+                ("move_interval", "<f8"), ("next_move_time", "<f8"))
+SAVE_DTYPE = np.dtype(list(SAVED_FIELDS))
+CATCH_UP_STEP = 1.0  # Batch size when fast-forwarding a map, coarser than a frame but finer than a move interval
+OCCUPANCY_CHUNK = 32  # Side of the blocks NPC counts are kept in, only blocks with an NPC in them get one
+
+
+class NPCView(Mapping):
+    # Dict-style access to one NPC in the store, so callers can keep using npc["pos"] etc.
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        getter = FIELD_GETTERS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self.store, self.index)
+
+    def __setitem__(self, key, value):
+        setter = FIELD_SETTERS.get(key)
+        if setter is None:
+            raise KeyError(f"NPC field '{key}' can't be set")
+        setter(self.store, self.index, value)
+
+    def __iter__(self):
+        return iter(FIELD_GETTERS)
+
+    def __len__(self):
+        return len(FIELD_GETTERS)
+
+
+class OccupancyCounts:
+    # NPC count per cell of one map, by flat cell index. Counts are kept in a row per OCCUPANCY_CHUNK square block
+    # that has an NPC in it, so a huge map with a few NPCs costs a few KB rather than a count for every tile
+    def __init__(self, width, height):
+        self.width = width
+        self.chunks_x = -(-width // OCCUPANCY_CHUNK)
+        blocks = self.chunks_x * -(-height // OCCUPANCY_CHUNK)
+        self.row_of = np.full(blocks, -1, dtype=np.int32)  # Block -> row of counts, -1 while nobody's in it
+        self.counts = np.zeros((0, OCCUPANCY_CHUNK * OCCUPANCY_CHUNK), dtype=np.uint16)
+        self.block_of = np.zeros(0, dtype=np.int64)  # Row -> block
+        self.free_rows = []
+
+    def locate(self, cells):
+        # Block number and offset inside the block for each flat cell
+        x = cells % self.width
+        y = cells // self.width
+        blocks = (y // OCCUPANCY_CHUNK) * self.chunks_x + x // OCCUPANCY_CHUNK
+        return blocks, (y % OCCUPANCY_CHUNK) * OCCUPANCY_CHUNK + x % OCCUPANCY_CHUNK
+
+    def get(self, cells):
+        blocks, offsets = self.locate(cells)
+        rows = self.row_of[blocks]
+        if not len(self.counts):
+            return np.zeros(cells.shape, dtype=np.uint16)
+        return np.where(rows >= 0, self.counts[np.maximum(rows, 0), offsets], 0)
+
+    def increment(self, cells):
+        # One more NPC on each cell, a cell listed twice gets two
+        blocks, offsets = self.locate(cells)
+        for block in np.unique(blocks[self.row_of[blocks] < 0]).tolist():
+            if not self.free_rows:
+                self.grow()
+            row = self.free_rows.pop()
+            self.row_of[block] = row
+            self.block_of[row] = block
+        np.add.at(self.counts, (self.row_of[blocks], offsets), 1)
+
+    def decrement(self, cells):
+        blocks, offsets = self.locate(cells)
+        rows = self.row_of[blocks]
+        np.subtract.at(self.counts, (rows, offsets), 1)
+        # Blocks left with nobody in them give their row back
+        rows = np.unique(rows)
+        for row in rows[~self.counts[rows].any(axis=1)].tolist():
+            self.row_of[self.block_of[row]] = -1
+            self.free_rows.append(row)
+
+    def grow(self):
+        used = len(self.counts)
+        capacity = max(16, used * 2)
+        counts = np.zeros((capacity, self.counts.shape[1]), dtype=np.uint16)
+        counts[:used] = self.counts
+        block_of = np.zeros(capacity, dtype=np.int64)
+        block_of[:used] = self.block_of
+        self.counts = counts
+        self.block_of = block_of
+        self.free_rows.extend(range(capacity - 1, used - 1, -1))
+
+
+class NPCStore(Mapping):
+    # Hot per-NPC fields live in contiguous arrays, names/colors/dialogue on the side
+    def __init__(self, maps, navigation, capacity=16):
+        self.maps = maps
+        self.navigation = navigation  # Walkability and the distance fields NPCs follow home
+        self.map_names = list(maps)
+        self.map_indexes = {map_name: i for i, map_name in enumerate(self.map_names)}
+        self.map_widths = [maps[map_name].width for map_name in self.map_names]
+        self.map_heights = [maps[map_name].height for map_name in self.map_names]
+        self.occupied = [None] * len(self.map_names)  # OccupancyCounts per map, made when the first NPC is added
+        self.members = [None] * len(self.map_names)  # Indexes of the NPCs on each map, rebuilt after NPCs change map
+        self.move_timers = [None] * len(self.map_names)  # BatchTimerQueue of move times per map, built on first use
+        self.sim_time = np.zeros(len(self.map_names))  # Clock time each map's NPCs have been simulated up to
+
+        self.count = 0
+        self.pos_x = np.zeros(capacity, dtype=np.int32)
+        self.pos_y = np.zeros(capacity, dtype=np.int32)
+        self.start_x = np.zeros(capacity, dtype=np.int32)
+        self.start_y = np.zeros(capacity, dtype=np.int32)
+        self.movement_range = np.zeros(capacity, dtype=np.int32)
+        self.last_move_time = np.zeros(capacity, dtype=np.float64)
+        self.move_interval = np.zeros(capacity, dtype=np.float64)
+        self.next_move_time = np.full(capacity, np.inf)
+        self.move_count = np.zeros(capacity, dtype=np.int32)
+        self.return_to_start = np.zeros(capacity, dtype=bool)
+        self.map_index = np.zeros(capacity, dtype=np.int32)
+        self.seduction_level = np.zeros(capacity, dtype=np.int32)
+
+        self.ids = []
+        self.index_of = {}
+        self.names = []
+        self.colors = []
+        self.movement_levels = []
+        self.dialogues = []
+        self.effect_start_times = []
+        self.effect_intervals = []
+        self.effect_types = []
+
+    HOT_ARRAYS = ("pos_x", "pos_y", "start_x", "start_y", "movement_range", "last_move_time", "move_interval",
+                  "next_move_time", "move_count", "return_to_start", "map_index", "seduction_level")
+
+    def grow(self):
+        capacity = max(16, len(self.pos_x) * 2)
+        for name in self.HOT_ARRAYS:
+            array = getattr(self, name)
+            grown = np.full(capacity, np.inf) if name == "next_move_time" else np.zeros(capacity, dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+
+    def add(self, npc_id, name, map_name, pos, movement_range, movement_level, dialogue, color,
+            seduction_level, last_move_time, move_interval):
+        if self.count == len(self.pos_x):
+            self.grow()
+        index = self.count
+        self.count += 1
+
+        map_index = self.map_indexes[map_name]
+        self.pos_x[index], self.pos_y[index] = pos
+        self.start_x[index], self.start_y[index] = pos
+        self.movement_range[index] = movement_range
+        self.last_move_time[index] = last_move_time
+        self.move_interval[index] = move_interval
+        self.next_move_time[index] = last_move_time + move_interval
+        if self.move_timers[map_index] is not None:
+            self.move_timers[map_index].schedule(np.array([index]), self.next_move_time[index:index + 1].copy())
+        self.move_count[index] = 0
+        self.return_to_start[index] = False
+        self.map_index[index] = map_index
+        self.seduction_level[index] = seduction_level
+
+        self.ids.append(npc_id)
+        self.index_of[npc_id] = index
+        self.names.append(name)
+        self.colors.append(color)
+        self.movement_levels.append(movement_level)
+        self.dialogues.append(dialogue)
+        self.effect_start_times.append(None)
+        self.effect_intervals.append(0)
+        self.effect_types.append(None)
+
+        self.occupancy_counts(map_index).increment(np.array([pos[1] * self.map_widths[map_index] + pos[0]]))
+        self.members[map_index] = None
+        return index
+
+    def map_members(self, map_index):
+        members = self.members[map_index]
+        if members is None:
+            members = np.flatnonzero(self.map_index[:self.count] == map_index)
+            self.members[map_index] = members
+        return members
+
+    def occupancy_counts(self, map_index):
+        counts = self.occupied[map_index]
+        if counts is None:
+            counts = OccupancyCounts(self.map_widths[map_index], self.map_heights[map_index])
+            self.occupied[map_index] = counts
+        return counts
+
+    def is_occupied(self, map_name, x, y):
+        map_index = self.map_indexes[map_name]
+        if not (0 <= x < self.map_widths[map_index] and 0 <= y < self.map_heights[map_index]):
+            return False
+        return bool(self.occupancy_counts(map_index).get(np.array([y * self.map_widths[map_index] + x]))[0])
+
+    def adjacent(self, map_name, x, y):
+        # Ids of the NPCs on the four tiles around (x, y), in the same order as DIRECTIONS
+        members = self.map_members(self.map_indexes[map_name])
+        dx = self.pos_x[members] - x
+        dy = self.pos_y[members] - y
+        beside = np.flatnonzero(np.abs(dx) + np.abs(dy) == 1)
+        dx = dx[beside]
+        direction = np.select([dx == -1, dx == 1, dy[beside] == -1], [0, 1, 2], 3)  # Left, right, up, down
+        return [self.ids[index] for index in members[beside][np.argsort(direction, kind="stable")].tolist()]
+
+    def in_rect(self, map_name, x, y, width, height):
+        # Ids of the NPCs inside the tile rect, row by row
+        members = self.map_members(self.map_indexes[map_name])
+        pos_x = self.pos_x[members]
+        pos_y = self.pos_y[members]
+        inside = (pos_x >= x) & (pos_x < x + width) & (pos_y >= y) & (pos_y < y + height)
+        members = members[inside]
+        members = members[np.lexsort((pos_x[inside], pos_y[inside]))]
+        return [self.ids[index] for index in members.tolist()]
+
+    def place(self, index, map_name, pos):
+        # Move one NPC anywhere, keeping the occupancy counts in step
+        old_map = self.map_index[index]
+        old_pos = (int(self.pos_x[index]), int(self.pos_y[index]))
+        new_map = self.map_indexes[map_name]
+        self.occupancy_counts(new_map).increment(np.array([pos[1] * self.map_widths[new_map] + pos[0]]))
+        self.occupancy_counts(old_map).decrement(np.array([old_pos[1] * self.map_widths[old_map] + old_pos[0]]))
+        self.map_index[index] = new_map
+        self.pos_x[index], self.pos_y[index] = pos
+        if new_map != old_map:
+            self.members[old_map] = None
+            self.members[new_map] = None
+            # The old map's timer entry goes stale, the move is timed on the new map from now on
+            self.schedule(np.array([index]), self.next_move_time[index:index + 1].copy())
+
+    def timers(self, map_index):
+        timers = self.move_timers[map_index]
+        if timers is None:
+            timers = BatchTimerQueue()
+            members = self.map_members(map_index)
+            timers.schedule(members, self.next_move_time[members])
+            self.move_timers[map_index] = timers
+        return timers
+
+    def schedule(self, indices, times):
+        # Sets the next move time of a batch of NPCs, all timing goes through here so the timer queues stay in step
+        self.next_move_time[indices] = times
+        maps = self.map_index[indices]
+        for map_index in np.unique(maps).tolist():
+            if self.move_timers[map_index] is not None:
+                on_map = indices[maps == map_index]
+                self.move_timers[map_index].schedule(on_map, self.next_move_time[on_map])
+
+    def due(self, current_time, map_index):
+        # NPCs on the map whose move time has come, taken off the map's timer queue so the cost follows the number
+        # that are due rather than the map's population
+        indices, times = self.timers(map_index).take_due(current_time)
+        # Entries left behind by a reschedule or a change of map are dropped, the rest go in index order
+        indices = np.sort(indices[(self.next_move_time[indices] == times) & (self.map_index[indices] == map_index)])
+        # An NPC scheduled twice for the same time shows up twice
+        return np.concatenate((indices[:1], indices[1:][indices[1:] != indices[:-1]]))
+
+    def fast_forward(self, map_index, current_time, rng, player_map, player_pos, step=CATCH_UP_STEP):
+        # Bring a map that hasn't been simulated every frame up to current_time, in coarse batches
+        members = self.map_members(map_index)
+        start = self.sim_time[map_index]
+        if len(members) and current_time - start > SETTLE_AFTER:
+            self.settle(members, map_index, current_time, rng, player_map, player_pos)
+        elif len(members):
+            batch_time = start
+            while batch_time < current_time:
+                batch_time = min(batch_time + step, current_time)
+                due = self.due(batch_time, map_index)
+                if len(due):
+                    self.step(due, batch_time, rng, player_map, player_pos)
+        self.sim_time[map_index] = current_time
+
+    def settle(self, members, map_index, current_time, rng, player_map, player_pos):
+        # Closed-form catch-up for a map left for longer than SETTLE_AFTER. Its NPCs would have wandered off and come
+        # home a few times by now, so rather than replaying that each one is dropped on a random free tile within
+        # its range and starts a fresh wander partway through its next interval
+        player_cell = -1
+        if map_index == self.map_indexes.get(player_map, -1):
+            player_cell = player_pos[1] * self.map_widths[map_index] + player_pos[0]
+        waiting = members
+        for _ in range(SETTLE_TRIES):
+            radii = self.movement_range[waiting]
+            offset_x = rng.integers(-radii, radii + 1)
+            offset_y = rng.integers(-radii, radii + 1)
+            new_x = self.start_x[waiting] + offset_x
+            new_y = self.start_y[waiting] + offset_y
+            cells, valid = self.candidate_cells(map_index, new_x, new_y, player_cell)
+            valid &= np.abs(offset_x) + np.abs(offset_y) <= radii  # Sampled in the square, kept in the diamond
+            moved = self.apply_moves(waiting[valid], cells[valid], map_index)
+            waiting = np.setdiff1d(waiting, moved, assume_unique=True)
+            if not len(waiting):
+                break
+
+        self.move_count[members] = 0
+        self.return_to_start[members] = False
+        self.move_interval[members] = rng.uniform(2, 4, len(members))
+        self.last_move_time[members] = current_time - rng.random(len(members)) * self.move_interval[members]
+        self.move_timers[map_index] = None  # Every queued entry is stale now, rebuilt from next_move_time on first use
+        self.schedule(members, self.last_move_time[members] + self.move_interval[members])
+
+    def step(self, indices, current_time, rng, player_map, player_pos):
+        # One movement tick for a batch of due NPCs, returns the indices that changed cell
+        moved = []
+        player_map_index = self.map_indexes.get(player_map, -1)
+        batch_maps = self.map_index[indices]
+        for map_index in np.unique(batch_maps):
+            group = indices[batch_maps == map_index]
+            player_cell = -1
+            if map_index == player_map_index:
+                player_cell = player_pos[1] * self.map_widths[map_index] + player_pos[0]
+
+            returning = self.return_to_start[group]
+            if not returning.all():
+                moved.append(self.random_walk(group[~returning], map_index, rng, player_cell))
+            if returning.any():
+                moved.append(self.walk_home(group[returning], map_index, player_cell))
+
+        self.last_move_time[indices] = current_time
+        self.move_count[indices] += 1
+        done = self.move_count[indices] >= MOVES_BEFORE_RETURNING
+        self.return_to_start[indices[done]] = True
+        still_wandering = indices[~done]
+        self.move_interval[still_wandering] = rng.uniform(2, 4, len(still_wandering))
+        self.schedule(indices, current_time + self.move_interval[indices])
+        return np.concatenate(moved) if moved else indices[:0]
+
+    def candidate_cells(self, map_index, new_x, new_y, player_cell):
+        # Cell index for every candidate plus whether an NPC may step there
+        width = self.map_widths[map_index]
+        inside = (new_x >= 0) & (new_x < width) & (new_y >= 0) & (new_y < self.map_heights[map_index])
+        cells = np.where(inside, new_y * width + new_x, 0)
+        free = (self.navigation.walkable_at(self.map_names[map_index], new_x, new_y)  # In bounds and not a wall
+                & (self.occupancy_counts(map_index).get(cells) == 0)  # Not another NPC
+                & (cells != player_cell))  # Not the player's position
+        return cells, free
+
+    def random_walk(self, group, map_index, rng, player_cell):
+        new_x = self.pos_x[group][:, None] + DIRECTIONS[:, 0]
+        new_y = self.pos_y[group][:, None] + DIRECTIONS[:, 1]
+        cells, valid = self.candidate_cells(map_index, new_x, new_y, player_cell)
+        distance_from_start = np.abs(new_x - self.start_x[group][:, None]) + np.abs(new_y - self.start_y[group][:, None])
+        valid &= distance_from_start <= self.movement_range[group][:, None]
+
+        # Pick a random valid direction per NPC
+        scores = rng.random(valid.shape)
+        scores[~valid] = -1
+        choice = scores.argmax(axis=1)
+        can_move = valid.any(axis=1)
+        return self.apply_moves(group[can_move], cells[can_move, choice[can_move]], map_index)
+
+    def walk_home(self, group, map_index, player_cell):
+        # Each NPC steps downhill on a cached distance field around its home, so walls get walked round
+        new_x, new_y, stepping = self.navigation.steps_home(
+            self.map_names[map_index], self.pos_x[group], self.pos_y[group], self.start_x[group], self.start_y[group],
+            self.movement_range[group])
+        cells, valid = self.candidate_cells(map_index, new_x, new_y, player_cell)
+        valid &= stepping
+        moved = self.apply_moves(group[valid], cells[valid], map_index)
+
+        # Home, blocked or cut off from home: back to wandering
+        blocked = np.setdiff1d(group, moved, assume_unique=True)
+        self.move_count[blocked] = 0
+        self.return_to_start[blocked] = False
+        return moved
+
+    def apply_moves(self, movers, targets, map_index):
+        if len(movers) == 0:
+            return movers
+        # Two NPCs can pick the same free cell, the first one in the batch gets it
+        _, first = np.unique(targets, return_index=True)
+        first.sort()
+        movers = movers[first]
+        targets = targets[first]
+
+        width = self.map_widths[map_index]
+        old_x = self.pos_x[movers]
+        old_y = self.pos_y[movers]
+        counts = self.occupancy_counts(map_index)
+        counts.increment(targets)  # Before the decrement, so a move inside a block doesn't give its row up and back
+        counts.decrement(old_y * width + old_x)
+        self.pos_x[movers] = targets % width
+        self.pos_y[movers] = targets // width
+        return movers
+
+    def snapshot(self):
+        # Copy of the saved fields as one record per NPC, in store order
+        rows = np.empty(self.count, dtype=SAVE_DTYPE)
+        for field, _ in SAVED_FIELDS:
+            rows[field] = getattr(self, field)[:self.count]
+        return rows
+
+    def restore(self, indexes, rows, time_offset=0.0):
+        # Writes saved records back into the given NPC slots, times shifted onto the running clock
+        old_map = self.map_index[indexes]
+        old_x = self.pos_x[indexes]
+        old_y = self.pos_y[indexes]
+        for field, _ in SAVED_FIELDS:
+            getattr(self, field)[indexes] = rows[field]
+        self.last_move_time[indexes] += time_offset
+        self.next_move_time[indexes] += time_offset
+
+        # Only the NPCs that ended up on a different cell need re-indexing
+        moved = (old_map != self.map_index[indexes]) | (old_x != self.pos_x[indexes]) | (old_y != self.pos_y[indexes])
+        moved_indexes = indexes[moved]
+        from_maps = old_map[moved]
+        from_cells = old_y[moved] * np.take(self.map_widths, from_maps) + old_x[moved]
+        to_maps = self.map_index[moved_indexes]
+        to_cells = self.pos_y[moved_indexes] * np.take(self.map_widths, to_maps) + self.pos_x[moved_indexes]
+        for map_index in np.unique(to_maps).tolist():
+            self.occupancy_counts(map_index).increment(to_cells[to_maps == map_index])
+        for map_index in np.unique(from_maps).tolist():
+            self.occupancy_counts(map_index).decrement(from_cells[from_maps == map_index])
+        if (old_map != self.map_index[indexes]).any():
+            self.members = [None] * len(self.map_names)
+        self.move_timers = [None] * len(self.map_names)  # Move times came from the save, rebuilt on next use
+
+    def __getitem__(self, npc_id):
+        return NPCView(self, self.index_of[npc_id])
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, npc_id):
+        return npc_id in self.index_of
+
+
+def set_field(field):
+    def setter(store, index, value):
+        getattr(store, field)[index] = value
+    return setter
+
+
+FIELD_GETTERS = {
+    "id": lambda store, i: store.ids[i],
+    "name": lambda store, i: store.names[i],
+    "pos": lambda store, i: [int(store.pos_x[i]), int(store.pos_y[i])],
+    "start_pos": lambda store, i: [int(store.start_x[i]), int(store.start_y[i])],
+    "last_move_time": lambda store, i: float(store.last_move_time[i]),
+    "move_interval": lambda store, i: float(store.move_interval[i]),
+    "movement_level": lambda store, i: store.movement_levels[i],
+    "movement_range": lambda store, i: int(store.movement_range[i]),
+    "dialogue": lambda store, i: store.dialogues[i],
+    "color": lambda store, i: store.colors[i],
+    "map": lambda store, i: store.map_names[store.map_index[i]],
+    "move_count": lambda store, i: int(store.move_count[i]),
+    "return_to_start": lambda store, i: bool(store.return_to_start[i]),
+    "seduction_level": lambda store, i: int(store.seduction_level[i]),
+    "effect_start_time": lambda store, i: store.effect_start_times[i],
+    "effect_interval": lambda store, i: store.effect_intervals[i],
+    "effect_type": lambda store, i: store.effect_types[i],
+}
+
+FIELD_SETTERS = {
+    "pos": lambda store, i, value: store.place(i, store.map_names[store.map_index[i]], value),
+    "map": lambda store, i, value: store.place(i, value, (int(store.pos_x[i]), int(store.pos_y[i]))),
+    "last_move_time": set_field("last_move_time"),
+    "move_interval": set_field("move_interval"),
+    "move_count": set_field("move_count"),
+    "return_to_start": set_field("return_to_start"),
+    "seduction_level": set_field("seduction_level"),
+    "effect_start_time": set_field("effect_start_times"),
+    "effect_interval": set_field("effect_intervals"),
+    "effect_type": set_field("effect_types"),
+}
@@ -1,3 +1,6 @@
+MIN_SEDUCTION_LEVEL = -99
+MAX_SEDUCTION_LEVEL = 3
+
 class NPCManager:
     def __init__(self):
         self.npcs = {
@@ -32,14 +35,15 @@ class NPCManager:
         if npc_name in self.npcs:
             self.npcs[npc_name]["seduction_level"] += change
             # Optional: Add bounds to seduction levels (e.g., -99 to 3)
-            self.npcs[npc_name]["seduction_level"] = max(-99, min(3, self.npcs[npc_name]["seduction_level"]))
+            self.npcs[npc_name]["seduction_level"] = max(MIN_SEDUCTION_LEVEL, min(MAX_SEDUCTION_LEVEL, self.npcs[npc_name]["seduction_level"]))
             # Log the updated seduction level
             print(f"[NPCManager] {self.npcs[npc_name]['name']}'s seduction level updated to {self.npcs[npc_name]['seduction_level']}")
 
     def save_state(self):
-        # Implement saving to a file if needed
-        pass
+        # Seduction levels are the only thing that changes while playing
+        return {npc_name: npc["seduction_level"] for npc_name, npc in self.npcs.items()}
 
-    def load_state(self):
-        # Implement loading from a file if needed
-        pass
+    def load_state(self, state):
+        for npc_name, seduction_level in state.items():
+            if npc_name in self.npcs:
+                self.npcs[npc_name]["seduction_level"] = seduction_level
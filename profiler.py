@@ -0,0 +1,165 @@
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+PROFILE_WINDOW = 300  # Frames kept per span for the rolling percentiles
+HUD_REFRESH_INTERVAL = 0.25  # Seconds between HUD text updates, so the numbers are readable
+MAX_TRACE_EVENTS = 500000  # Trace capture stops here rather than eating memory
+HUD_SPANS = 6  # Slowest spans listed on the HUD
+HUD_LINES = HUD_SPANS + 3  # Plus frame times, counters and input latency
+HUD_WIDTH = 280  # The HUD keeps one size so a shorter update never leaves old text behind
+
+
+class NullSpan:
+    # What span() hands out while profiling is off, entering and leaving it does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_span(self.name, self.start, time.perf_counter())
+        return False
+
+
+class FrameProfiler:
+    # Named spans and counters per frame, rolling percentiles over recent frames and an optional Chrome trace.
+    # While disabled, span() returns NULL_SPAN and callers skip count() behind `if profiler.enabled`
+    def __init__(self, window=PROFILE_WINDOW):
+        self.enabled = False
+        self.hud_visible = False
+        self.window = window
+        self.samples = {}  # span name -> deque of per-frame milliseconds
+        self.frame_spans = {}  # span name -> milliseconds so far this frame, a span can run once per update step
+        self.counters = {}  # counter name -> count so far this frame
+        self.last_counters = {}  # The previous frame's counters, for the HUD
+        self.frame_start = None
+        self.trace_events = None  # Chrome trace events while capturing
+        self.trace_origin = time.perf_counter()
+        self.hud_lines = []
+        self.hud_updated_at = 0.0
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        self.frame_start = None
+        self.frame_spans.clear()
+        self.counters.clear()
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_span(self, name, start, end):
+        milliseconds = (end - start) * 1000
+        self.frame_spans[name] = self.frame_spans.get(name, 0.0) + milliseconds
+        if self.trace_events is not None:
+            self.add_trace_event({"name": name, "ph": "X", "pid": os.getpid(), "tid": 0,
+                                  "ts": (start - self.trace_origin) * 1e6, "dur": milliseconds * 1000})
+
+    def record(self, name, milliseconds):
+        # A sample that isn't a span in the current frame, like how long an input took to reach the screen
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append(milliseconds)
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        # Files this frame's spans and counters. Returns True when the HUD text changed and wants drawing
+        if not self.enabled or self.frame_start is None:
+            return False
+        end = time.perf_counter()
+        self.add_span("frame", self.frame_start, end)
+        for name, milliseconds in self.frame_spans.items():
+            self.record(name, milliseconds)
+        if self.trace_events is not None and self.counters:
+            self.add_trace_event({"name": "counts", "ph": "C", "pid": os.getpid(), "tid": 0,
+                                  "ts": (end - self.trace_origin) * 1e6, "args": dict(self.counters)})
+        self.last_counters = self.counters
+        self.counters = {}
+        self.frame_spans = {}
+        self.frame_start = None
+
+        if self.hud_visible and end - self.hud_updated_at >= HUD_REFRESH_INTERVAL:
+            self.hud_updated_at = end
+            self.hud_lines = self.summary_lines()
+            return True
+        return False
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        samples = self.samples.get(name)
+        if not samples:
+            return None
+        return np.percentile(np.fromiter(samples, dtype=np.float64, count=len(samples)), points)
+
+    def summary_lines(self):
+        lines = []
+        frame = self.percentiles("frame")
+        if frame is not None:
+            lines.append(f"frame {self.samples['frame'][-1]:5.2f} ms  p95 {frame[1]:5.2f}  p99 {frame[2]:5.2f}")
+        counts = self.last_counters
+        lines.append(f"npcs {counts.get('npcs', 0)}  blits {counts.get('blits', 0)}  text {counts.get('text', 0)}")
+        latency = self.percentiles("input_latency")
+        if latency is not None:
+            lines.append(f"input to display p50 {latency[0]:5.1f}  p95 {latency[1]:5.1f} ms")
+        spans = [(self.percentiles(name)[1], name) for name in self.samples if name not in ("frame", "input_latency")]
+        for p95, name in sorted(spans, reverse=True)[:HUD_SPANS]:
+            lines.append(f"{name:<14} p95 {p95:5.2f} ms")
+        return lines
+
+    def draw_hud(self, screen, text_renderer, font):
+        # Top-left overlay, returns the Rect it covered
+        if not self.hud_lines:
+            self.hud_lines = self.summary_lines()
+        surfaces = [text_renderer.render(line, font, (255, 255, 0)) for line in self.hud_lines]
+        line_height = font.get_linesize()
+        width = HUD_WIDTH
+        height = line_height * HUD_LINES + 8
+        screen.fill((0, 0, 0), (0, 0, width, height))
+        for i, surface in enumerate(surfaces):
+            screen.blit(surface, (6, 4 + i * line_height))
+        return screen.get_rect().clip((0, 0, width, height))
+
+    def start_trace(self):
+        self.trace_events = []
+        self.trace_origin = time.perf_counter()
+
+    def add_trace_event(self, event):
+        if len(self.trace_events) < MAX_TRACE_EVENTS:
+            self.trace_events.append(event)
+
+    def stop_trace(self, path):
+        # Writes the capture as Chrome trace-event JSON, open it in chrome://tracing or Perfetto
+        events = self.trace_events or []
+        self.trace_events = None
+        with open(path, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        print(f"[Profiler] Wrote {len(events)} trace events to {path}")
@@ -0,0 +1,89 @@
+import os
+import argparse
+import time
+
+import numpy as np
+
+import pygame
+from engine import Game
+from input_log import InputReplayer, read_recording
+
+
+def percentiles(samples):
+    if not samples:
+        return "no samples"
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {max(samples):.2f} ms"
+
+
+def replay(path, headless=False, trace_path=None, maps_path='data/maps.json', npcs_path='data/npcs.json'):
+    # Feeds a recording back through a fresh game. Headless runs as fast as possible, otherwise at 1x with rendering
+    recording = read_recording(path)
+    if headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    game = Game(screen, seed=recording.seed, headless=headless)  # No save_dir, replays never touch saves/
+    replayer = InputReplayer(recording)
+    game.input = replayer
+    game.menu_engine.continue_available = recording.continue_available
+    game.start_loading(maps_path, npcs_path)
+    if trace_path:
+        game.profiler.start_trace()
+        game.profiler.enable()
+
+    end_step = recording.end_step
+    if end_step is None:
+        print("[Replay] Recording was cut off, replaying up to its last input")
+        end_step = recording.records[-1][0] + 1 if recording.records else 0
+
+    update_times = []
+    render_times = []
+    wall_start = time.perf_counter()
+    for step in range(end_step):
+        for event in replayer.events_before(step):
+            game.handle_event(event)
+        game.profiler.begin_frame()
+        start = time.perf_counter()
+        game.update()
+        update_times.append((time.perf_counter() - start) * 1000)
+        if not headless:
+            pygame.event.pump()  # Keep the window responsive, the recording is the only input
+            if game.scheduler.dirty:
+                start = time.perf_counter()
+                game.render()
+                game.scheduler.frame_drawn()
+                render_times.append((time.perf_counter() - start) * 1000)
+        game.profiler.end_frame()
+        if not headless:
+            delay = wall_start + (step + 1) * game.step_dt - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    wall_time = time.perf_counter() - wall_start
+
+    print(f"[Replay] {end_step} steps ({end_step * game.step_dt:.1f}s simulated) in {wall_time:.2f}s")
+    print(f"[Replay] update: {percentiles(update_times)}")
+    if not headless:
+        print(f"[Replay] render: {percentiles(render_times)} over {len(render_times)} frames")
+        print(f"[Replay] input to display: {game.input_queue.latency_summary()}")
+    if trace_path:
+        game.profiler.stop_trace(trace_path)
+    if recording.checksum is not None:
+        if game.state_checksum() == recording.checksum:
+            print("[Replay] Final state matches the recording")
+        else:
+            print("[Replay] Final state differs from the recording")
+    return game
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a session recorded with main.py --record")
+    parser.add_argument("recording", help="Recording file")
+    parser.add_argument("--headless", action="store_true", help="No display, run as fast as possible")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome trace of the replay")
+    parser.add_argument("--world", metavar="PATH", default="data/maps.json",
+                        help="Maps the session was recorded on, if main.py was given --world")
+    args = parser.parse_args()
+
+    replay(args.recording, args.headless, args.trace, maps_path=args.world)
+    pygame.quit()
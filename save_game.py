@@ -0,0 +1,155 @@
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from npc_store import SAVE_DTYPE
+
+SAVE_MAGIC = b"RPGS"
+SAVE_VERSION = 1
+FULL_SAVE = 0
+DELTA_SAVE = 1
+# magic, version, kind, id of the full save, meta JSON length, NPC record count
+HEADER = struct.Struct("<4sHBIII")
+FULL_SAVE_RATIO = 0.5  # Write a new full save once more than this fraction of NPCs differ from the last one
+AUTOSAVE_INTERVAL = 30.0  # Simulated seconds between autosaves
+
+
+def encode_save(kind, save_id, meta, indexes, rows):
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    parts = [HEADER.pack(SAVE_MAGIC, SAVE_VERSION, kind, save_id, len(meta_bytes), len(rows)), meta_bytes]
+    if kind == DELTA_SAVE:
+        parts.append(indexes.astype("<u4").tobytes())
+    parts.append(rows.tobytes())
+    return b"".join(parts)
+
+
+def decode_save(data):
+    # Returns (kind, save id, meta, NPC indexes or None, NPC records)
+    magic, version, kind, save_id, meta_length, count = HEADER.unpack_from(data)
+    if magic != SAVE_MAGIC:
+        raise ValueError("not a save file")
+    if version != SAVE_VERSION:
+        raise ValueError(f"save version {version}, expected {SAVE_VERSION}")
+    offset = HEADER.size
+    meta = json.loads(data[offset:offset + meta_length])
+    offset += meta_length
+    indexes = None
+    if kind == DELTA_SAVE:
+        indexes = np.frombuffer(data, dtype="<u4", count=count, offset=offset).astype(np.int64)
+        offset += indexes.size * 4
+    rows = np.frombuffer(data, dtype=SAVE_DTYPE, count=count, offset=offset).copy()
+    return kind, save_id, meta, indexes, rows
+
+
+def write_atomic(path, data):
+    # A crash mid-write leaves the previous file in place rather than half a save
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+class SaveManager:
+    # A full save plus one delta of the NPCs that changed since, written on a background thread
+    def __init__(self, save_dir="saves"):
+        self.save_dir = save_dir
+        self.full_path = os.path.join(save_dir, "save.full")
+        self.delta_path = os.path.join(save_dir, "save.delta")
+        self.requests = queue.Queue()
+        self.thread = None
+        # Last full save, only touched by the writer thread once it's running
+        self.base_id = 0
+        self.base_ids = None
+        self.base_rows = None
+
+    def has_save(self):
+        return os.path.exists(self.full_path)
+
+    def save(self, meta, rows):
+        # rows must be a copy the game won't write to again, encoding happens on the writer thread
+        self.start_writer()
+        self.requests.put((meta, rows))
+
+    def start_writer(self):
+        # Started on the first save, and again if it ever died so nothing is left queued with nobody to write it
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.write_loop, name="save-writer", daemon=True)
+            self.thread.start()
+
+    def flush(self):
+        # Blocks until every queued save is on disk (or has failed)
+        if self.thread is not None:
+            self.start_writer()
+            self.requests.join()
+
+    def write_loop(self):
+        while True:
+            meta, rows = self.requests.get()
+            try:
+                self.write(meta, rows)
+            except Exception as error:  # Anything escaping would kill the thread and leave flush() waiting forever
+                print(f"[SaveManager] Save failed: {type(error).__name__}: {error}")
+            finally:
+                self.requests.task_done()
+
+    def write(self, meta, rows):
+        start = time.perf_counter()
+        os.makedirs(self.save_dir, exist_ok=True)
+
+        changed = None
+        if self.base_rows is not None and meta["ids"] == self.base_ids:
+            changed = np.flatnonzero(rows != self.base_rows)
+
+        if changed is None or len(changed) > len(rows) * FULL_SAVE_RATIO:
+            # A new full save makes the old delta meaningless, drop it first so it can't be applied to the new one
+            if os.path.exists(self.delta_path):
+                os.remove(self.delta_path)
+            self.base_id = int.from_bytes(os.urandom(4), "little")
+            data = encode_save(FULL_SAVE, self.base_id, meta, None, rows)
+            write_atomic(self.full_path, data)
+            self.base_ids = meta["ids"]
+            self.base_rows = rows
+            kind = "full"
+        else:
+            delta_meta = {key: value for key, value in meta.items() if key != "ids"}
+            data = encode_save(DELTA_SAVE, self.base_id, delta_meta, changed, rows[changed])
+            write_atomic(self.delta_path, data)
+            kind = f"delta ({len(changed)} NPCs)"
+        print(f"[SaveManager] Wrote {kind} save, {len(data)} bytes in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def load(self):
+        # Returns (meta, NPC records) of the newest save, or None if there isn't a usable one
+        self.flush()
+        try:
+            with open(self.full_path, "rb") as file:
+                kind, save_id, meta, _, rows = decode_save(file.read())
+            if kind != FULL_SAVE:
+                raise ValueError("expected a full save")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as error:
+            print(f"[SaveManager] Can't load {self.full_path}: {error}")
+            return None
+        # Later deltas are written against this save
+        self.base_id = save_id
+        self.base_ids = meta["ids"]
+        self.base_rows = rows.copy()
+
+        try:
+            with open(self.delta_path, "rb") as file:
+                kind, delta_id, delta_meta, indexes, delta_rows = decode_save(file.read())
+            if kind == DELTA_SAVE and delta_id == save_id:
+                rows[indexes] = delta_rows
+                meta = dict(delta_meta, ids=meta["ids"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, struct.error) as error:
+            print(f"[SaveManager] Ignoring {self.delta_path}: {error}")
+        except IndexError:
+            print(f"[SaveManager] Ignoring {self.delta_path}: NPC index out of range")
+        return meta, rows
@@ -0,0 +1,11 @@
+STEP_DT = 1 / 60  # Length of one fixed simulation step in seconds
+
+class SimulationClock:
+    def __init__(self, start_time=0.0):
+        self.time = start_time
+
+    def now(self):
+        return self.time
+
+    def advance(self, dt):
+        self.time += dt
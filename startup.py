@@ -0,0 +1,59 @@
+import threading
+import time
+
+class StartupPipeline:
+    # Runs the loading stages on a worker thread so they overlap with the menu
+    def __init__(self, stages):
+        self.stages = stages  # [(stage name, function)], run in order
+        self.timings = []  # (stage name, milliseconds) for each stage that has finished
+        self.current_stage = None
+        self.error = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="startup", daemon=True)
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            for name, stage in self.stages:
+                self.current_stage = name
+                start = time.perf_counter()
+                stage()
+                self.timings.append((name, (time.perf_counter() - start) * 1000))
+        except Exception as error:
+            self.error = error  # Raised again on the main thread by wait()
+        finally:
+            self.current_stage = None
+            self.finished_at = time.perf_counter()
+            self.done.set()
+
+    def progress(self):
+        return len(self.timings) / len(self.stages) if self.stages else 1.0
+
+    def status(self):
+        # Short line for the menu
+        if self.error is not None:
+            return f"Loading failed: {self.error}"
+        if self.done.is_set():
+            return None
+        return f"Loading {self.current_stage or '...'} {self.progress():.0%}"
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def add_timing(self, name, milliseconds):
+        # For stages that have to run on the main thread afterwards
+        self.timings.append((name, milliseconds))
+
+    def report(self):
+        lines = [f"[Startup] {name:<12} {milliseconds:8.1f} ms" for name, milliseconds in self.timings]
+        if self.finished_at is not None:
+            lines.append(f"[Startup] {'worker total':<12} {(self.finished_at - self.started_at) * 1000:8.1f} ms")
+        return lines
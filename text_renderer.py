@@ -0,0 +1,90 @@
+from collections import OrderedDict
+
+import pygame
+
+SURFACE_BUDGET_BYTES = 8 * 1024 * 1024  # Rendered text kept around, least recently used goes first
+MAX_WRAPPED_TEXTS = 512
+MAX_WORD_WIDTHS = 8192  # Measured words kept, least recently used goes first
+WRAP_SLACK = 8  # Pixels either side of the wrap width where a line gets measured for real
+
+class TextRenderer:
+    def __init__(self, surface_budget=SURFACE_BUDGET_BYTES, max_wrapped=MAX_WRAPPED_TEXTS, max_word_widths=MAX_WORD_WIDTHS):
+        self.fonts = {}  # (font name, size) -> Font
+        self.surface_budget = surface_budget
+        self.surface_bytes = 0
+        self.surfaces = OrderedDict()  # (font, text, color, antialias) -> Surface
+        self.max_wrapped = max_wrapped
+        self.wrapped = OrderedDict()  # (font, text, max width) -> list of lines
+        self.max_word_widths = max_word_widths
+        self.word_widths = OrderedDict()  # (font, word) -> width
+
+    def get_font(self, size, name=None):
+        # Fonts are shared, creating one means loading and parsing the font file
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(name, size)
+            self.fonts[key] = font
+        return font
+
+    def render(self, text, font, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        surface = font.render(text, antialias, color)
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        self.surfaces[key] = surface
+        self.surface_bytes += size
+        while self.surface_bytes > self.surface_budget and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.surface_bytes -= evicted.get_width() * evicted.get_height() * evicted.get_bytesize()
+        return surface
+
+    def word_width(self, font, word):
+        key = (font, word)
+        width = self.word_widths.get(key)
+        if width is not None:
+            self.word_widths.move_to_end(key)
+            return width
+        width = font.size(word)[0]
+        self.word_widths[key] = width
+        if len(self.word_widths) > self.max_word_widths:
+            self.word_widths.popitem(last=False)
+        return width
+
+    def wrap(self, text, font, max_width):
+        key = (font, text, max_width)
+        lines = self.wrapped.get(key)
+        if lines is not None:
+            self.wrapped.move_to_end(key)
+            return lines
+
+        # Each word is measured once and line widths are summed, rather than re-measuring the whole line per word
+        space_width = self.word_width(font, ' ')
+        lines = []
+        current_line = []
+        current_width = 0
+        for word in text.split(' '):
+            width = self.word_width(font, word)
+            test_width = current_width + space_width + width if current_line else width
+            if current_line and abs(test_width - max_width) <= WRAP_SLACK:
+                # Summed widths can be a few pixels off the real line width, so measure close calls exactly
+                fits = font.size(' '.join(current_line + [word]))[0] <= max_width
+            else:
+                fits = test_width <= max_width or not current_line
+            if fits:
+                current_line.append(word)
+                current_width = test_width
+            else:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+                current_width = width
+        lines.append(' '.join(current_line))
+
+        self.wrapped[key] = lines
+        if len(self.wrapped) > self.max_wrapped:
+            self.wrapped.popitem(last=False)
+        return lines
@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+# Tile IDs stored in the compiled grid
+TILE_FLOOR = 0
+TILE_WALL = 1
+TILE_DOOR = 2
+TILE_PORTAL = 3
+TILE_EMPTY = 4  # Unknown tile strings, walkable but drawn as nothing
+
+TileType = namedtuple("TileType", ["name", "walkable", "transition", "image"])
+
+# Indexed by tile ID
+TILE_TYPES = (
+    TileType("floor", True, None, "floor"),
+    TileType("wall", False, None, "wall"),
+    TileType("door", True, "D", "door"),
+    TileType("portal", True, "P", "portal"),
+    TileType("empty", True, None, None),
+)
+
+# Flat lookup so collision checks are a single index
+WALKABLE = bytes(1 if tile_type.walkable else 0 for tile_type in TILE_TYPES)
+
+
+def compile_tile(tile):
+    # Returns (tile_id, transition_target) for a raw tile string from maps.json
+    if tile == '0':
+        return TILE_FLOOR, None
+    elif tile == '1':
+        return TILE_WALL, None
+    elif tile.startswith('D['):
+        return TILE_DOOR, tile[tile.index('[') + 1:tile.index(']')]
+    elif tile.startswith('P['):
+        return TILE_PORTAL, tile[tile.index('[') + 1:tile.index(']')]
+    return TILE_EMPTY, None
+
+
+class TileMap:
+    def __init__(self, name, width, height, tiles, transitions=None):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.tiles = tiles  # bytearray of tile IDs, row-major
+        self.transitions = transitions or {}  # (x, y) -> target map name for door/portal tiles
+
+    @classmethod
+    def from_rows(cls, name, rows):
+        height = len(rows)
+        width = len(rows[0]) if height else 0
+        tiles = bytearray(width * height)
+        transitions = {}
+
+        for y, row in enumerate(rows):
+            if len(row) != width:
+                raise ValueError(f"Map '{name}' row {y} has {len(row)} tiles, expected {width}")
+            for x, tile in enumerate(row):
+                tile_id, target = compile_tile(tile)
+                tiles[y * width + x] = tile_id
+                if target is not None:
+                    transitions[(x, y)] = target
+
+        return cls(name, width, height, tiles, transitions)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def tile_at(self, x, y):
+        return self.tiles[y * self.width + x]
+
+    def is_walkable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and WALKABLE[self.tiles[y * self.width + x]] == 1
+
+    def get_row(self, y, x_start, x_end):
+        # Tile IDs for part of one row
+        row_start = y * self.width
+        return self.tiles[row_start + x_start:row_start + x_end]
+
+    def prefetch_rect(self, x, y, width, height):
+        pass  # Everything is already in memory
+
+    def transition_at(self, x, y):
+        # Returns (kind, target map) for door/portal tiles, None otherwise
+        target = self.transitions.get((x, y))
+        if target is None:
+            return None
+        return TILE_TYPES[self.tiles[y * self.width + x]].transition, target
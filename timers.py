@@ -0,0 +1,105 @@
+import heapq
+import itertools
+
+import numpy as np
+
+MERGE_FRACTION = 0.125  # BatchTimerQueue merges new entries once they're this share of the queue
+MIN_MERGE = 64  # ...or this many, whichever is more
+
+class TimerQueue:
+    # Min-heap of timed callbacks, so each tick only touches what is actually due
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()  # Tie-breaker keeps same-time timers in scheduling order
+
+    def schedule(self, when, callback, *args):
+        # Returns a handle that can be passed to cancel()
+        entry = [when, next(self.counter), callback, args, False]
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def cancel(self, handle):
+        handle[4] = True  # Lazily skipped when it reaches the top of the heap
+
+    def clear(self):
+        self.heap = []
+
+    def next_time(self):
+        while self.heap and self.heap[0][4]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def run_due(self, now):
+        # Calls every callback scheduled at or before now, including ones scheduled by those callbacks
+        ran = 0
+        while self.heap and self.heap[0][0] <= now:
+            when, _, callback, args, cancelled = heapq.heappop(self.heap)
+            if not cancelled:
+                callback(*args)
+                ran += 1
+        return ran
+
+    def __len__(self):
+        return len(self.heap)
+
+
+
+
+class BatchTimerQueue:
+    # TimerQueue for numpy batches of ids instead of callbacks. Entries are kept sorted by time, so taking what's due
+    # is a binary search and a slice. New entries wait unsorted until they're a fair share of the queue (or one comes
+    # due) and are then merged in together, so the sorting is paid per entry rather than per frame. Rescheduling an id
+    # leaves its old entry behind, the owner drops stale ones by checking the returned times against its own
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.times = np.zeros(0)
+        self.head = 0  # Entries before this have been taken
+        self.pending = []  # (ids, times) batches not merged in yet
+        self.pending_count = 0
+        self.pending_first = np.inf  # Earliest time among the pending entries
+
+    def schedule(self, ids, times):
+        # Keeps the arrays it's given, pass copies
+        if not len(ids):
+            return
+        self.pending.append((ids, times))
+        self.pending_count += len(ids)
+        self.pending_first = min(self.pending_first, times.min())
+        if self.pending_count > max(MIN_MERGE, (len(self.times) - self.head) * MERGE_FRACTION):
+            self.merge()
+
+    def merge(self):
+        ids = np.concatenate([batch[0] for batch in self.pending])
+        times = np.concatenate([batch[1] for batch in self.pending])
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        queued_times = self.times[self.head:]
+        queued_ids = self.ids[self.head:]
+        # Where each new entry lands in the merged arrays, after any queued ones with the same time so equal times
+        # come out in the order they were scheduled
+        at = np.searchsorted(queued_times, times, side="right") + np.arange(len(times))
+        queued = np.ones(len(queued_times) + len(times), dtype=bool)
+        queued[at] = False
+        self.times = np.empty(len(queued))
+        self.times[at] = times
+        self.times[queued] = queued_times
+        self.ids = np.empty(len(queued), dtype=np.int64)
+        self.ids[at] = ids[order]
+        self.ids[queued] = queued_ids
+        self.head = 0
+        self.pending = []
+        self.pending_count = 0
+        self.pending_first = np.inf
+
+    def take_due(self, now):
+        # Removes and returns (ids, times) of every entry due at or before now, earliest first
+        if self.pending_first <= now:
+            self.merge()
+        end = self.head + np.searchsorted(self.times[self.head:], now, side="right")
+        ids = self.ids[self.head:end]
+        times = self.times[self.head:end]
+        self.head = end
+        return ids, times
+
+    def __len__(self):
+        return len(self.times) - self.head + self.pending_count
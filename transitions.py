@@ -0,0 +1,51 @@
+from tile_map import TILE_TYPES
+
+FALLBACK_ARRIVAL = [1, 1]  # Where the player lands when the destination has no door back
+
+class TransitionIndex:
+    def __init__(self, maps):
+        self.links = {}  # (map name, (x, y)) -> (destination map, arrival cell)
+        self.graph = {}  # map name -> set of maps reachable through its doors/portals
+        self.problems = []  # Human readable descriptions of broken and one-way links
+        self.build(maps)
+
+    def build(self, maps):
+        # First door/portal of each kind leading to each target, per map (row-major like the old scan)
+        returns = {}
+        for map_name, tile_map in maps.items():
+            entries = returns.setdefault(map_name, {})
+            for (x, y), target in tile_map.transitions.items():
+                kind = TILE_TYPES[tile_map.tile_at(x, y)].transition
+                entries.setdefault((kind, target), [x, y])
+
+        for map_name, tile_map in maps.items():
+            self.graph.setdefault(map_name, set())
+            for (x, y), target in tile_map.transitions.items():
+                kind = TILE_TYPES[tile_map.tile_at(x, y)].transition
+                if target not in maps:
+                    self.problems.append(f"{kind}[{target}] at {map_name} ({x}, {y}) leads to a map that doesn't exist")
+                    continue
+
+                arrival = returns[target].get((kind, map_name))
+                if arrival is None:
+                    self.problems.append(f"{kind}[{target}] at {map_name} ({x}, {y}) is one-way, "
+                                         f"{target} has no {kind}[{map_name}] to arrive at")
+                    arrival = FALLBACK_ARRIVAL
+
+                self.links[(map_name, (x, y))] = (target, arrival)
+                self.graph[map_name].add(target)
+
+    def lookup(self, map_name, x, y):
+        # Returns (destination map, arrival cell) for a door/portal tile, None otherwise
+        return self.links.get((map_name, (x, y)))
+
+    def reachable_from(self, map_name):
+        # Every map the player can get to from map_name
+        seen = {map_name}
+        stack = [map_name]
+        while stack:
+            for neighbour in self.graph.get(stack.pop(), ()):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        return seen
@@ -0,0 +1,220 @@
+import argparse
+import json
+import mmap
+import struct
+from collections import OrderedDict
+
+from tile_map import TileMap, WALKABLE, TILE_TYPES, TILE_WALL
+
+# Binary world layout (all little-endian):
+#   header       magic, version, chunk size, map count
+#   map table    per map: name, width, height, chunk index offset, transition count, transition table offset
+#   chunk index  per map: one absolute offset per chunk, row-major over the chunk grid
+#   transitions  per map: x, y, tile ID, target map name
+#   chunk data   chunk_size * chunk_size tile IDs per chunk, edge chunks padded with walls
+MAGIC = b"RPGW"
+VERSION = 1
+DEFAULT_CHUNK_SIZE = 32
+MAX_RESIDENT_CHUNKS = 1024  # Per map, past this the least recently used chunk is dropped and its pages released
+
+HEADER = struct.Struct("<4sHHI")
+NAME_LENGTH = struct.Struct("<H")
+MAP_ENTRY = struct.Struct("<IIQIQ")
+CHUNK_OFFSET = struct.Struct("<Q")
+TRANSITION = struct.Struct("<IIB")
+
+
+def encode_name(name):
+    encoded = name.encode("utf-8")
+    return NAME_LENGTH.pack(len(encoded)) + encoded
+
+
+def decode_name(buffer, offset):
+    (length,) = NAME_LENGTH.unpack_from(buffer, offset)
+    offset += NAME_LENGTH.size
+    return bytes(buffer[offset:offset + length]).decode("utf-8"), offset + length
+
+
+def write_world(maps, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    # maps is a dict of map name -> TileMap
+    map_table_size = sum(NAME_LENGTH.size + len(name.encode("utf-8")) + MAP_ENTRY.size for name in maps)
+    offset = HEADER.size + map_table_size
+
+    # Lay out the chunk indexes and transition tables first so the map table can point at them
+    layout = {}
+    for name, tile_map in maps.items():
+        chunks_x = -(-tile_map.width // chunk_size)
+        chunks_y = -(-tile_map.height // chunk_size)
+        index_offset = offset
+        offset += chunks_x * chunks_y * CHUNK_OFFSET.size
+        transitions = b"".join(
+            TRANSITION.pack(x, y, tile_map.tile_at(x, y)) + encode_name(target)
+            for (x, y), target in tile_map.transitions.items()
+        )
+        transition_offset = offset
+        offset += len(transitions)
+        layout[name] = (chunks_x, chunks_y, index_offset, transition_offset, transitions)
+
+    chunk_bytes = chunk_size * chunk_size
+    with open(file_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, chunk_size, len(maps)))
+        for name, tile_map in maps.items():
+            chunks_x, chunks_y, index_offset, transition_offset, _ = layout[name]
+            file.write(encode_name(name))
+            file.write(MAP_ENTRY.pack(tile_map.width, tile_map.height, index_offset,
+                                      len(tile_map.transitions), transition_offset))
+
+        data_offset = offset
+        for name, tile_map in maps.items():
+            chunks_x, chunks_y, _, _, transitions = layout[name]
+            for chunk_number in range(chunks_x * chunks_y):
+                file.write(CHUNK_OFFSET.pack(data_offset + chunk_number * chunk_bytes))
+            file.write(transitions)
+            data_offset += chunks_x * chunks_y * chunk_bytes
+
+        for tile_map in maps.values():
+            for chunk_y in range(0, tile_map.height, chunk_size):
+                for chunk_x in range(0, tile_map.width, chunk_size):
+                    chunk = bytearray([TILE_WALL]) * chunk_bytes
+                    tiles_x = min(chunk_size, tile_map.width - chunk_x)
+                    for y in range(chunk_y, min(chunk_y + chunk_size, tile_map.height)):
+                        start = (y - chunk_y) * chunk_size
+                        chunk[start:start + tiles_x] = tile_map.get_row(y, chunk_x, chunk_x + tiles_x)
+                    file.write(chunk)
+
+
+def convert(json_path, bin_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(json_path, "r") as file:
+        raw_maps = json.load(file)
+    maps = {map_name: TileMap.from_rows(map_name, rows) for map_name, rows in raw_maps.items()}
+    write_world(maps, bin_path, chunk_size)
+    return maps
+
+
+class ChunkedTileMap:
+    # Same interface as TileMap, but tiles are read from a memory-mapped world file a chunk at a time
+    def __init__(self, name, width, height, buffer, chunk_size, chunk_offsets, transitions):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.buffer = buffer
+        self.chunk_size = chunk_size
+        self.chunks_x = -(-width // chunk_size)
+        self.chunk_offsets = chunk_offsets
+        self.transitions = transitions
+        self.resident = OrderedDict()  # (chunk_x, chunk_y) -> memoryview into the mapped file, most recently used last
+
+    def page_in(self, chunk_x, chunk_y):
+        if len(self.resident) >= MAX_RESIDENT_CHUNKS:
+            (old_x, old_y), _ = self.resident.popitem(last=False)
+            # Hand the chunk's pages back so the process doesn't keep the whole file mapped in. The page can hold
+            # neighbouring chunks too, those just fault back in from the page cache the next time they're read
+            self.advise(self.chunk_offsets[old_y * self.chunks_x + old_x], "MADV_DONTNEED")
+        offset = self.chunk_offsets[chunk_y * self.chunks_x + chunk_x]
+        chunk = self.buffer[offset:offset + self.chunk_size * self.chunk_size]
+        self.resident[(chunk_x, chunk_y)] = chunk
+        return chunk
+
+    def prefetch_rect(self, x, y, width, height):
+        # Ask the OS to start reading the chunks under a tile rect before they're touched
+        chunk_size = self.chunk_size
+        for chunk_y in range(max(0, y // chunk_size), min(self.height - 1, y + height - 1) // chunk_size + 1):
+            for chunk_x in range(max(0, x // chunk_size), min(self.width - 1, x + width - 1) // chunk_size + 1):
+                if (chunk_x, chunk_y) in self.resident:
+                    self.resident.move_to_end((chunk_x, chunk_y))
+                else:
+                    self.page_in(chunk_x, chunk_y)
+                    self.advise(self.chunk_offsets[chunk_y * self.chunks_x + chunk_x], "MADV_WILLNEED")
+
+    def advise(self, offset, advice):
+        # madvise over the pages under one chunk, where the platform has it
+        world_mmap = self.buffer.obj
+        advice = getattr(mmap, advice, None)
+        if hasattr(world_mmap, "madvise") and advice is not None:
+            page_start = offset - offset % mmap.PAGESIZE
+            length = offset + self.chunk_size * self.chunk_size - page_start
+            world_mmap.madvise(advice, page_start, length)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def chunk(self, chunk_x, chunk_y):
+        # A chunk's tiles, row-major chunk_size * chunk_size, paging it in if needed
+        chunk = self.resident.get((chunk_x, chunk_y))
+        if chunk is None:
+            return self.page_in(chunk_x, chunk_y)
+        self.resident.move_to_end((chunk_x, chunk_y))
+        return chunk
+
+    def tile_at(self, x, y):
+        chunk_size = self.chunk_size
+        chunk = self.chunk(x // chunk_size, y // chunk_size)
+        return chunk[(y % chunk_size) * chunk_size + x % chunk_size]
+
+    def is_walkable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and WALKABLE[self.tile_at(x, y)] == 1
+
+    def get_row(self, y, x_start, x_end):
+        chunk_size = self.chunk_size
+        row_start = (y % chunk_size) * chunk_size
+        parts = []
+        x = x_start
+        while x < x_end:
+            chunk = self.chunk(x // chunk_size, y // chunk_size)
+            end = min(x_end, (x // chunk_size + 1) * chunk_size)
+            parts.append(chunk[row_start + x % chunk_size:row_start + x % chunk_size + end - x])
+            x = end
+        return b"".join(parts)
+
+    def transition_at(self, x, y):
+        target = self.transitions.get((x, y))
+        if target is None:
+            return None
+        return TILE_TYPES[self.tile_at(x, y)].transition, target
+
+
+class WorldFile:
+    def __init__(self, file_path):
+        self.file = open(file_path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+        self.maps = self.read_maps()
+
+    def read_maps(self):
+        magic, version, chunk_size, map_count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.file.name} is not a world file")
+        if version != VERSION:
+            raise ValueError(f"{self.file.name} is world format version {version}, expected {VERSION}")
+
+        maps = {}
+        offset = HEADER.size
+        for _ in range(map_count):
+            name, offset = decode_name(self.buffer, offset)
+            width, height, index_offset, transition_count, transition_offset = MAP_ENTRY.unpack_from(self.buffer, offset)
+            offset += MAP_ENTRY.size
+
+            chunk_count = -(-width // chunk_size) * -(-height // chunk_size)
+            chunk_offsets = [CHUNK_OFFSET.unpack_from(self.buffer, index_offset + i * CHUNK_OFFSET.size)[0]
+                             for i in range(chunk_count)]
+
+            transitions = {}
+            position = transition_offset
+            for _ in range(transition_count):
+                x, y, _tile_id = TRANSITION.unpack_from(self.buffer, position)
+                target, position = decode_name(self.buffer, position + TRANSITION.size)
+                transitions[(x, y)] = target
+
+            maps[name] = ChunkedTileMap(name, width, height, self.buffer, chunk_size, chunk_offsets, transitions)
+        return maps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert maps.json into the chunked binary world format")
+    parser.add_argument("source", nargs="?", default="data/maps.json")
+    parser.add_argument("destination", nargs="?", default="data/world.bin")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    converted = convert(args.source, args.destination, args.chunk_size)
+    print(f"[World] Wrote {len(converted)} maps to {args.destination}")